@@ -0,0 +1,196 @@
+import numpy as np
+
+from chess_board import (Board, WHITE, BLACK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING,
+                         KNIGHT_ATTACKS, KING_ATTACKS, PROMOTION_RANKS)
+from chess_engine import PIECE_SQUARE, PIECE_VALUES
+
+# Planes are ordered white pawn..king, then black pawn..king: plane = color * 6 + kind - 1.
+PLANE_CODES = tuple((color << 3) | kind for color in (WHITE, BLACK) for kind in range(PAWN, KING + 1))
+CHUNK_SIZE = 8192
+
+FILE_A = np.uint64(0x0101010101010101)
+FILE_H = np.uint64(0x8080808080808080)
+NOT_FILE_A = ~FILE_A
+NOT_FILE_H = ~FILE_H
+RANK_3 = np.uint64(0x0000000000FF0000)
+RANK_6 = np.uint64(0x0000FF0000000000)
+BACK_RANKS = np.uint64(PROMOTION_RANKS)
+SQUARE_BITS = np.left_shift(np.uint64(1), np.arange(64, dtype=np.uint64))
+KNIGHT_TABLE = np.array(KNIGHT_ATTACKS, dtype=np.uint64)
+KING_TABLE = np.array(KING_ATTACKS, dtype=np.uint64)
+
+PST_WEIGHTS = np.array([[PIECE_SQUARE[code][sq] * (1 if code >> 3 == WHITE else -1) for sq in range(64)]
+                        for code in PLANE_CODES], dtype=np.float32)
+MATERIAL_WEIGHTS = np.array([PIECE_VALUES[code & 7] * (1 if code >> 3 == WHITE else -1) for code in PLANE_CODES],
+                            dtype=np.int64)
+
+# (shift, wrap mask) pairs; positive shifts move towards h8.
+ROOK_SHIFTS = ((8, None), (-8, None), (1, NOT_FILE_A), (-1, NOT_FILE_H))
+BISHOP_SHIFTS = ((9, NOT_FILE_A), (7, NOT_FILE_H), (-7, NOT_FILE_A), (-9, NOT_FILE_H))
+
+
+def _shift(bb, amount, mask=None):
+    if amount > 0:
+        bb = np.left_shift(bb, np.uint64(amount))
+    else:
+        bb = np.right_shift(bb, np.uint64(-amount))
+    return bb if mask is None else bb & mask
+
+
+def _slide(gen, empty, amount, mask):
+    propagate = empty if mask is None else empty & mask
+    gen = gen | (propagate & _shift(gen, amount))
+    propagate = propagate & _shift(propagate, amount)
+    gen = gen | (propagate & _shift(gen, amount * 2))
+    propagate = propagate & _shift(propagate, amount * 2)
+    gen = gen | (propagate & _shift(gen, amount * 4))
+    return _shift(gen, amount, mask)
+
+
+def fill_attacks(gen, occupied, shifts):
+    empty = ~occupied
+    attacks = np.zeros_like(gen)
+    for amount, mask in shifts:
+        attacks |= _slide(gen, empty, amount, mask)
+    return attacks
+
+
+def popcount(bb):
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(bb).astype(np.int64)
+    bb = bb - ((bb >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    bb = (bb & np.uint64(0x3333333333333333)) + ((bb >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    bb = (bb + (bb >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return ((bb * np.uint64(0x0101010101010101)) >> np.uint64(56)).astype(np.int64)
+
+
+def pack_boards(boards):
+    boards = list(boards)
+    bitboards = np.zeros((len(boards), 12), dtype='<u8')
+    side = np.zeros(len(boards), dtype=np.int8)
+    for i, board in enumerate(boards):
+        bitboards[i] = [board.bitboards[code] for code in PLANE_CODES]
+        side[i] = board.side_to_move
+    return bitboards, side
+
+
+def pack_fens(fens):
+    board = Board()
+    rows = []
+    sides = []
+    for fen in fens:
+        board.set_fen(fen)
+        rows.append([board.bitboards[code] for code in PLANE_CODES])
+        sides.append(board.side_to_move)
+    return np.array(rows, dtype='<u8').reshape(-1, 12), np.array(sides, dtype=np.int8)
+
+
+def pack_games(games):
+    return pack_boards(game.board for game in games)
+
+
+def unpack_planes(bitboards):
+    bits = np.unpackbits(np.ascontiguousarray(bitboards, dtype='<u8').view(np.uint8), bitorder='little')
+    return bits.reshape(len(bitboards), 12, 64)
+
+
+def unpack_bit_planes(bitboard):
+    bits = np.unpackbits(np.ascontiguousarray(bitboard, dtype='<u8').view(np.uint8), bitorder='little')
+    return bits.reshape(len(bitboard), 64).astype(bool)
+
+
+def _chunks(count):
+    for start in range(0, count, CHUNK_SIZE):
+        yield slice(start, min(start + CHUNK_SIZE, count))
+
+
+def _relative(scores, side):
+    return np.where(side == WHITE, scores, -scores)
+
+
+def material_scores(bitboards, side):
+    return _relative(popcount(bitboards) @ MATERIAL_WEIGHTS, side)
+
+
+def evaluate_batch(bitboards, side):
+    scores = np.empty(len(bitboards), dtype=np.int64)
+    weights = PST_WEIGHTS.reshape(-1)
+    for part in _chunks(len(bitboards)):
+        planes = unpack_planes(bitboards[part]).reshape(-1, 12 * 64).astype(np.float32)
+        scores[part] = np.rint(planes @ weights)
+    return _relative(scores, side)
+
+
+def _side_attacks(bitboards, color, occupied, own, enemy):
+    base = 0 if color == WHITE else 6
+    pawns = bitboards[:, base + PAWN - 1]
+    if color == WHITE:
+        pawn_east, pawn_west = _shift(pawns, 9, NOT_FILE_A), _shift(pawns, 7, NOT_FILE_H)
+        single = _shift(pawns, 8) & ~occupied
+        double = _shift(single & RANK_3, 8) & ~occupied
+    else:
+        pawn_east, pawn_west = _shift(pawns, -7, NOT_FILE_A), _shift(pawns, -9, NOT_FILE_H)
+        single = _shift(pawns, -8) & ~occupied
+        double = _shift(single & RANK_6, -8) & ~occupied
+    attacked = pawn_east | pawn_west
+    # Each promotion is four moves; castling and en passant need state the planes do not carry.
+    pawn_moves = popcount(double)
+    for targets in (pawn_east & enemy, pawn_west & enemy, single):
+        pawn_moves += popcount(targets) + 3 * popcount(targets & BACK_RANKS)
+
+    count = len(bitboards)
+    mobility = np.zeros(count, dtype=np.int64)
+    king_moves = np.zeros(count, dtype=np.int64)
+    for kind in (KNIGHT, BISHOP, ROOK, QUEEN, KING):
+        pieces = bitboards[:, base + kind - 1]
+        owner, sq = np.nonzero(unpack_bit_planes(pieces))
+        if kind == KNIGHT:
+            attacks = KNIGHT_TABLE[sq]
+            attacked |= _union(owner, attacks, count)
+        elif kind == KING:
+            attacks = KING_TABLE[sq]
+            attacked |= _union(owner, attacks, count)
+        else:
+            shifts = BISHOP_SHIFTS if kind == BISHOP else ROOK_SHIFTS if kind == ROOK else ROOK_SHIFTS + BISHOP_SHIFTS
+            attacks = fill_attacks(SQUARE_BITS[sq], occupied[owner], shifts)
+            attacked |= fill_attacks(pieces, occupied, shifts)
+        counts = np.bincount(owner, weights=popcount(attacks & ~own[owner]), minlength=count).astype(np.int64)
+        if kind == KING:
+            king_moves = counts
+        else:
+            mobility += counts
+    return attacked, mobility, pawn_moves + mobility + king_moves
+
+
+def _union(owner, attacks, count):
+    union = np.zeros(count, dtype=np.uint64)
+    np.bitwise_or.at(union, owner, attacks)
+    return union
+
+
+def analyse_batch(bitboards, side):
+    count = len(bitboards)
+    mobility = np.zeros((count, 2), dtype=np.int64)
+    attacked = np.zeros((count, 2), dtype=np.int64)
+    moves = np.zeros(count, dtype=np.int64)
+    for part in _chunks(count):
+        chunk = bitboards[part]
+        occupancy = [np.bitwise_or.reduce(chunk[:, base:base + 6], axis=1) for base in (0, 6)]
+        occupied = occupancy[WHITE] | occupancy[BLACK]
+        for color in (WHITE, BLACK):
+            side_attacked, side_mobility, side_moves = _side_attacks(chunk, color, occupied, occupancy[color],
+                                                                     occupancy[color ^ 1])
+            attacked[part, color] = popcount(side_attacked)
+            mobility[part, color] = side_mobility
+            moves[part] = np.where(side[part] == color, side_moves, moves[part])
+    return {
+        'material': material_scores(bitboards, side),
+        'score': evaluate_batch(bitboards, side),
+        'mobility': mobility,
+        'attacked': attacked,
+        'moves': moves,
+    }
+
+
+def pseudo_legal_move_counts(bitboards, side):
+    return analyse_batch(bitboards, side)['moves']
@@ -0,0 +1,183 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+from chess_board import Board, START_FEN, iter_bits
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+
+PERFT_POSITIONS = [
+    ('startpos', START_FEN, [20, 400, 8902, 197281]),
+    ('rook-endgame', '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1', [14, 191, 2812, 43238]),
+    ('kiwipete', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1', [48, 2039, 97862]),
+    ('promotions', 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1', [6, 264, 9467]),
+    ('discovered-check', 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8', [44, 1486, 62379]),
+    ('symmetric', 'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10', [46, 2079, 89890]),
+]
+
+MIDDLEGAME_FEN = 'r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4'
+CHECKMATE_FEN = 'rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 1 3'
+CHECK_FEN = 'r1bqkbnr/pppp1Qpp/2n5/4p3/4P3/8/PPPP1PPP/RNB1KBNR b KQkq - 0 3'
+
+
+def perft(board, depth):
+    if depth == 0:
+        return 1
+    moves = board.legal_moves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        board.make_move(move)
+        nodes += perft(board, depth - 1)
+        board.unmake_move()
+    return nodes
+
+
+def divide(board, depth):
+    counts = {}
+    for move in board.legal_moves():
+        board.make_move(move)
+        counts[move] = perft(board, depth - 1)
+        board.unmake_move()
+    return counts
+
+
+def board_from_fen(fen):
+    board = Board()
+    board.set_fen(fen)
+    return board
+
+
+def time_best(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+def bench_perft(max_depth, repeat):
+    results = {}
+    errors = []
+    for name, fen, expected in PERFT_POSITIONS:
+        board = board_from_fen(fen)
+        depth = min(max_depth, len(expected))
+        elapsed, nodes = time_best(lambda: perft(board, depth), repeat)
+        if nodes != expected[depth - 1]:
+            errors.append(f"perft {name} depth {depth}: expected {expected[depth - 1]}, got {nodes}")
+        results[f"perft/{name}"] = nodes / elapsed
+    return results, errors
+
+
+def bench_is_valid_move(repeat, passes=50):
+    board = board_from_fen(MIDDLEGAME_FEN)
+    pairs = [(start, end) for start in iter_bits(board.occupied) for end in range(64)] * passes
+    elapsed, _ = time_best(lambda: [board.is_valid_move(start, end) for start, end in pairs], repeat)
+    return len(pairs) / elapsed
+
+
+def bench_is_in_check(repeat, iterations=10000):
+    board = board_from_fen(CHECK_FEN)
+    moves = board.legal_moves()
+
+    def run():
+        for i in range(iterations):
+            board.make_move(moves[i % len(moves)])
+            board.is_in_check(board.side_to_move)
+            board.unmake_move()
+    elapsed, _ = time_best(run, repeat)
+    return iterations / elapsed
+
+
+def bench_is_checkmate(fen, repeat, iterations=500):
+    board = board_from_fen(fen)
+    elapsed, _ = time_best(lambda: [board.is_checkmate(board.side_to_move) for _ in range(iterations)], repeat)
+    return iterations / elapsed
+
+
+def bench_termination(repeat, iterations=5000):
+    board = board_from_fen(MIDDLEGAME_FEN)
+    moves = board.legal_moves()
+
+    def run():
+        for i in range(iterations):
+            board.make_move(moves[i % len(moves)])
+            board.termination()
+            board.unmake_move()
+    elapsed, _ = time_best(run, repeat)
+    return iterations / elapsed
+
+
+def bench_legal_moves(repeat, iterations=300):
+    board = board_from_fen(MIDDLEGAME_FEN)
+    elapsed, _ = time_best(lambda: [board.legal_moves() for _ in range(iterations)], repeat)
+    return iterations / elapsed
+
+
+def run_round(perft_depth):
+    results, errors = bench_perft(perft_depth, 1)
+    results['is_valid_move'] = bench_is_valid_move(1)
+    results['is_in_check'] = bench_is_in_check(1)
+    results['is_checkmate/mated'] = bench_is_checkmate(CHECKMATE_FEN, 1)
+    results['is_checkmate/middlegame'] = bench_is_checkmate(CHECK_FEN, 1)
+    results['legal_moves'] = bench_legal_moves(1)
+    results['termination'] = bench_termination(1)
+    return results, errors
+
+
+def run_benchmarks(perft_depth=2, repeat=20):
+    # Host speed drifts for seconds at a time, so each round takes one short sample of every benchmark
+    # and the fastest round is kept; back-to-back repeats would all land in the same slow spell.
+    results = {}
+    for _ in range(repeat):
+        round_results, errors = run_round(perft_depth)
+        for name, value in round_results.items():
+            results[name] = max(results.get(name, 0), value)
+    return results, errors
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, value in sorted(results.items()):
+        expected = baseline.get(name)
+        if expected and value < expected * (1 - tolerance):
+            regressions.append(f"{name}: {value:,.0f}/s is below baseline {expected:,.0f}/s")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the chess rules core.')
+    parser.add_argument('--depth', type=int, default=2, help='maximum perft depth')
+    parser.add_argument('--repeat', type=int, default=20, help='interleaved timing rounds, best one is kept')
+    parser.add_argument('--tolerance', type=float, default=0.4,
+                        help='allowed slowdown against the baseline, kept above the run-to-run noise')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    results, errors = run_benchmarks(args.depth, args.repeat)
+    for name, value in sorted(results.items()):
+        print(f"{name:28s} {value:14,.0f}/s")
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({name: round(value) for name, value in sorted(results.items())}, f, indent=2)
+            f.write('\n')
+        print(f"Baseline written to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            errors.extend(compare(results, json.load(f), args.tolerance))
+
+    for error in errors:
+        print(f"FAIL {error}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
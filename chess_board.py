@@ -0,0 +1,678 @@
+import random
+from array import array
+
+from chess_history import MoveHistory
+
+WHITE = 0
+BLACK = 1
+
+EMPTY = 0
+PAWN = 1
+KNIGHT = 2
+BISHOP = 3
+ROOK = 4
+QUEEN = 5
+KING = 6
+
+BACK_RANK = (ROOK, KNIGHT, BISHOP, QUEEN, KING, BISHOP, KNIGHT, ROOK)
+
+PIECE_LETTERS = ' pnbrqk'
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+ROOK_DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+BISHOP_DIRECTIONS = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+KNIGHT_OFFSETS = ((2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2))
+KING_OFFSETS = ROOK_DIRECTIONS + BISHOP_DIRECTIONS
+
+# A snapshot is the 64 square codes as bytes; the top bit of the first bytes carries side to move,
+# castling rights and the en passant file, so the whole position fits in 64 immutable bytes.
+SNAPSHOT_SIZE = 64
+SNAPSHOT_STATE_BITS = 9
+SNAPSHOT_PIECES = bytes(code & 15 for code in range(256))
+
+WHITE_KINGSIDE = 1
+WHITE_QUEENSIDE = 2
+BLACK_KINGSIDE = 4
+BLACK_QUEENSIDE = 8
+ALL_CASTLING = 15
+
+PROMOTION_KINDS = (QUEEN, ROOK, BISHOP, KNIGHT)
+PROMOTION_RANKS = 0xFF000000000000FF
+DARK_SQUARES = 0xAA55AA55AA55AA55
+FIFTY_MOVE_PLIES = 100
+
+
+def make_piece(color, kind):
+    return kind | (color << 3)
+
+
+def piece_color(code):
+    return code >> 3
+
+
+def piece_kind(code):
+    return code & 7
+
+
+def square(x, y):
+    return y * 8 + x
+
+
+def square_xy(sq):
+    return sq & 7, sq >> 3
+
+
+def square_name(sq):
+    return 'abcdefgh'[sq & 7] + str((sq >> 3) + 1)
+
+
+def parse_square(name):
+    if len(name) != 2 or name[0] not in 'abcdefgh' or name[1] not in '12345678':
+        raise ValueError(f"Invalid square: {name}")
+    return square('abcdefgh'.index(name[0]), int(name[1]) - 1)
+
+
+def piece_letter(code):
+    letter = PIECE_LETTERS[code & 7]
+    return letter.upper() if code >> 3 == WHITE else letter
+
+
+def encode_move(start, end, promotion=EMPTY):
+    return start | (end << 6) | (promotion << 12)
+
+
+def move_start(move):
+    return move & 63
+
+
+def move_end(move):
+    return (move >> 6) & 63
+
+
+def move_promotion(move):
+    return (move >> 12) & 7
+
+
+def iter_bits(bb):
+    while bb:
+        lsb = bb & -bb
+        yield lsb.bit_length() - 1
+        bb ^= lsb
+
+
+def _offset_table(offsets):
+    table = []
+    for sq in range(64):
+        x, y = square_xy(sq)
+        bb = 0
+        for dx, dy in offsets:
+            if 0 <= x + dx < 8 and 0 <= y + dy < 8:
+                bb |= 1 << square(x + dx, y + dy)
+        table.append(bb)
+    return table
+
+
+KNIGHT_ATTACKS = _offset_table(KNIGHT_OFFSETS)
+KING_ATTACKS = _offset_table(KING_OFFSETS)
+PAWN_ATTACKS = (_offset_table(((1, 1), (-1, 1))), _offset_table(((1, -1), (-1, -1))))
+
+
+def _ray_table(dx, dy):
+    table = []
+    for sq in range(64):
+        x, y = square_xy(sq)
+        bb = 0
+        x, y = x + dx, y + dy
+        while 0 <= x < 8 and 0 <= y < 8:
+            bb |= 1 << square(x, y)
+            x, y = x + dx, y + dy
+        table.append(bb)
+    return table, dy * 8 + dx > 0
+
+
+def _between_table():
+    table = [[None] * 64 for sq in range(64)]
+    for start in range(64):
+        for dx, dy in KING_OFFSETS:
+            x, y = square_xy(start)
+            mask = 0
+            x, y = x + dx, y + dy
+            while 0 <= x < 8 and 0 <= y < 8:
+                end = square(x, y)
+                table[start][end] = mask
+                mask |= 1 << end
+                x, y = x + dx, y + dy
+    return table
+
+
+ROOK_RAYS = tuple(_ray_table(dx, dy) for dx, dy in ROOK_DIRECTIONS)
+BISHOP_RAYS = tuple(_ray_table(dx, dy) for dx, dy in BISHOP_DIRECTIONS)
+QUEEN_RAYS = ROOK_RAYS + BISHOP_RAYS
+BETWEEN = _between_table()
+
+
+CASTLING_MASKS = [ALL_CASTLING] * 64
+CASTLING_MASKS[0] &= ~WHITE_QUEENSIDE
+CASTLING_MASKS[7] &= ~WHITE_KINGSIDE
+CASTLING_MASKS[4] &= ~(WHITE_KINGSIDE | WHITE_QUEENSIDE)
+CASTLING_MASKS[56] &= ~BLACK_QUEENSIDE
+CASTLING_MASKS[63] &= ~BLACK_KINGSIDE
+CASTLING_MASKS[60] &= ~(BLACK_KINGSIDE | BLACK_QUEENSIDE)
+
+# (right, king start, king end, rook start, rook end, squares that must be empty, squares the king crosses)
+CASTLING_PATHS = tuple(
+    (right, king_start, king_end, rook_start, rook_end,
+     BETWEEN[king_start][rook_start], BETWEEN[king_start][king_end] | (1 << king_start) | (1 << king_end))
+    for right, king_start, king_end, rook_start, rook_end in (
+        (WHITE_KINGSIDE, 4, 6, 7, 5), (WHITE_QUEENSIDE, 4, 2, 0, 3),
+        (BLACK_KINGSIDE, 60, 62, 63, 61), (BLACK_QUEENSIDE, 60, 58, 56, 59)))
+CASTLING_ROOKS = {king_end: (rook_start, rook_end) for _, _, king_end, rook_start, rook_end, _, _ in CASTLING_PATHS}
+COLOR_CASTLING = (WHITE_KINGSIDE | WHITE_QUEENSIDE, BLACK_KINGSIDE | BLACK_QUEENSIDE)
+
+_zobrist_random = random.Random(0x5EED)
+ZOBRIST_PIECES = [[_zobrist_random.getrandbits(64) for sq in range(64)] for code in range(16)]
+ZOBRIST_CASTLING = [_zobrist_random.getrandbits(64) for rights in range(16)]
+ZOBRIST_EP = [_zobrist_random.getrandbits(64) for x in range(8)]
+ZOBRIST_SIDE = _zobrist_random.getrandbits(64)
+
+
+def slide_attacks(sq, occupied, rays):
+    attacks = 0
+    for table, positive in rays:
+        ray = table[sq]
+        blockers = ray & occupied
+        if blockers:
+            if positive:
+                ray ^= table[(blockers & -blockers).bit_length() - 1]
+            else:
+                ray ^= table[blockers.bit_length() - 1]
+        attacks |= ray
+    return attacks
+
+
+class Board:
+    __slots__ = ('move_cache', 'history', 'squares', 'bitboards', 'occupancy', 'occupied', 'side_to_move',
+                 'start_ply', 'castling', 'ep_square', 'halfmove_clock', 'hash', 'king_squares', 'repetitions')
+
+    def __init__(self, move_cache=None):
+        self.move_cache = move_cache
+        self.history = MoveHistory()
+        self.clear()
+
+    def clear(self):
+        self.squares = bytearray(64)
+        self.bitboards = [0] * 16
+        self.occupancy = [0, 0]
+        self.occupied = 0
+        self.side_to_move = WHITE
+        self.start_ply = 0
+        self.castling = 0
+        self.ep_square = None
+        self.halfmove_clock = 0
+        self.hash = 0
+        self.history.clear()
+        self.king_squares = [None, None]
+        self.repetitions = {}
+
+    def setup_initial(self):
+        self.clear()
+        for x, kind in enumerate(BACK_RANK):
+            self.put_piece(square(x, 0), make_piece(WHITE, kind))
+            self.put_piece(square(x, 1), make_piece(WHITE, PAWN))
+            self.put_piece(square(x, 6), make_piece(BLACK, PAWN))
+            self.put_piece(square(x, 7), make_piece(BLACK, kind))
+        self.castling = ALL_CASTLING
+        self.reset_history()
+
+    def set_fen(self, fen):
+        fields = fen.split()
+        if len(fields) < 4:
+            raise ValueError(f"Invalid FEN: {fen}")
+        rows = fields[0].split('/')
+        if len(rows) != 8:
+            raise ValueError(f"Invalid FEN placement: {fields[0]}")
+        placement = []
+        for row, text in enumerate(rows):
+            y = 7 - row
+            x = 0
+            for char in text:
+                if char.isdigit():
+                    x += int(char)
+                elif char.lower() in PIECE_LETTERS[1:] and x < 8:
+                    placement.append((square(x, y), make_piece(WHITE if char.isupper() else BLACK,
+                                                               PIECE_LETTERS.index(char.lower()))))
+                    x += 1
+                else:
+                    raise ValueError(f"Invalid FEN placement: {fields[0]}")
+            if x != 8:
+                raise ValueError(f"Invalid FEN placement: {fields[0]}")
+        if fields[1] not in ('w', 'b'):
+            raise ValueError(f"Invalid side to move: {fields[1]}")
+        if fields[2] != '-' and (not fields[2] or any(char not in 'KQkq' for char in fields[2])):
+            raise ValueError(f"Invalid castling rights: {fields[2]}")
+        validate_position(placement, WHITE if fields[1] == 'w' else BLACK)
+        ep_square = parse_square(fields[3]) if fields[3] != '-' else None
+        if ep_square is not None:
+            validate_ep_square(placement, WHITE if fields[1] == 'w' else BLACK, ep_square)
+        try:
+            halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+        except ValueError:
+            raise ValueError(f"Invalid halfmove clock: {fields[4]}")
+        if halfmove_clock < 0:
+            raise ValueError(f"Invalid halfmove clock: {fields[4]}")
+        try:
+            fullmove = int(fields[5]) if len(fields) > 5 else 1
+        except ValueError:
+            raise ValueError(f"Invalid move number: {fields[5]}")
+
+        self.clear()
+        for sq, code in placement:
+            self.put_piece(sq, code)
+        self.side_to_move = WHITE if fields[1] == 'w' else BLACK
+        if fields[2] != '-':
+            for char in fields[2]:
+                self.castling |= 1 << 'KQkq'.index(char)
+            self.drop_missing_castling()
+        if ep_square is not None:
+            self.set_ep_square(ep_square)
+        self.halfmove_clock = halfmove_clock
+        self.start_ply = 2 * (max(fullmove, 1) - 1) + self.side_to_move
+        self.reset_history()
+
+    def fen(self):
+        rows = []
+        for y in range(7, -1, -1):
+            text = ''
+            empty = 0
+            for x in range(8):
+                code = self.squares[square(x, y)]
+                if code:
+                    if empty:
+                        text += str(empty)
+                        empty = 0
+                    text += piece_letter(code)
+                else:
+                    empty += 1
+            if empty:
+                text += str(empty)
+            rows.append(text)
+        castling = ''.join(char for i, char in enumerate('KQkq') if self.castling & (1 << i)) or '-'
+        ep_square = square_name(self.ep_square) if self.ep_square is not None else '-'
+        side = 'w' if self.side_to_move == WHITE else 'b'
+        return f"{'/'.join(rows)} {side} {castling} {ep_square} {self.halfmove_clock} {self.fullmove_number()}"
+
+    # A snapshot holds the placement, side to move, castling rights and en passant file only;
+    # set_snapshot restarts the halfmove clock, move number and repetition history.
+    def snapshot(self):
+        state = self.side_to_move | (self.castling << 1)
+        if self.ep_square is not None:
+            state |= ((self.ep_square & 7) + 1) << 5
+        data = bytearray(self.squares)
+        for i in range(SNAPSHOT_STATE_BITS):
+            if state >> i & 1:
+                data[i] |= 0x80
+        return bytes(data)
+
+    def set_snapshot(self, data):
+        if len(data) != SNAPSHOT_SIZE:
+            raise ValueError(f"Invalid snapshot size: {len(data)}")
+        codes = data.translate(SNAPSHOT_PIECES)
+        if any(code & 7 in (EMPTY, 7) for code in codes if code):
+            raise ValueError('Invalid snapshot piece code')
+        state = 0
+        for i in range(SNAPSHOT_STATE_BITS):
+            state |= (data[i] >> 7) << i
+        placement = [(sq, code) for sq, code in enumerate(codes) if code]
+        validate_position(placement, state & 1)
+        ep_file = state >> 5
+        ep_square = square(ep_file - 1, 5 if state & 1 == WHITE else 2) if ep_file else None
+        if ep_square is not None:
+            validate_ep_square(placement, state & 1, ep_square)
+        self.clear()
+        for sq, code in enumerate(codes):
+            if code:
+                self.put_piece(sq, code)
+        self.side_to_move = state & 1
+        self.castling = (state >> 1) & ALL_CASTLING
+        self.drop_missing_castling()
+        if ep_square is not None:
+            self.set_ep_square(ep_square)
+        self.start_ply = self.side_to_move
+        self.reset_history()
+
+    def set_ep_square(self, ep_square):
+        pawn = make_piece(self.side_to_move, PAWN)
+        if PAWN_ATTACKS[self.side_to_move ^ 1][ep_square] & self.bitboards[pawn]:
+            self.ep_square = ep_square
+
+    def drop_missing_castling(self):
+        for right, king_start, _, rook_start, _, _, _ in CASTLING_PATHS:
+            color = WHITE if right & COLOR_CASTLING[WHITE] else BLACK
+            if (self.squares[king_start] != make_piece(color, KING)
+                    or self.squares[rook_start] != make_piece(color, ROOK)):
+                self.castling &= ~right
+
+    def fullmove_number(self):
+        return (self.start_ply + len(self.history)) // 2 + 1
+
+    def reset_history(self):
+        self.history.clear()
+        self.hash = self.compute_hash()
+        self.repetitions = {self.hash: 1}
+
+    def compute_hash(self):
+        key = ZOBRIST_CASTLING[self.castling]
+        if self.side_to_move == BLACK:
+            key ^= ZOBRIST_SIDE
+        if self.ep_square is not None:
+            key ^= ZOBRIST_EP[self.ep_square & 7]
+        for sq, code in enumerate(self.squares):
+            if code:
+                key ^= ZOBRIST_PIECES[code][sq]
+        return key
+
+    def piece_at(self, sq):
+        return self.squares[sq]
+
+    def put_piece(self, sq, code):
+        bit = 1 << sq
+        self.squares[sq] = code
+        self.bitboards[code] |= bit
+        self.occupancy[code >> 3] |= bit
+        self.occupied |= bit
+        self.hash ^= ZOBRIST_PIECES[code][sq]
+        if code & 7 == KING:
+            self.king_squares[code >> 3] = sq
+
+    def remove_piece(self, sq):
+        code = self.squares[sq]
+        if code:
+            bit = 1 << sq
+            self.squares[sq] = EMPTY
+            self.bitboards[code] &= ~bit
+            self.occupancy[code >> 3] &= ~bit
+            self.occupied &= ~bit
+            self.hash ^= ZOBRIST_PIECES[code][sq]
+            if code & 7 == KING:
+                self.king_squares[code >> 3] = None
+        return code
+
+    def move_piece(self, start, end):
+        captured = self.remove_piece(end)
+        self.put_piece(end, self.remove_piece(start))
+        return captured
+
+    def make_move(self, move):
+        start, end = move & 63, (move >> 6) & 63
+        castling, ep_square, halfmove_clock = self.castling, self.ep_square, self.halfmove_clock
+        previous_hash = self.hash
+        code = self.squares[start]
+        kind = code & 7
+        if kind == PAWN and end == ep_square:
+            captured = self.remove_piece(end ^ 8)
+            self.move_piece(start, end)
+        else:
+            captured = self.move_piece(start, end)
+            if move >> 12:
+                self.remove_piece(end)
+                self.put_piece(end, (move >> 12) | (code & 8))
+            elif kind == KING and abs(end - start) == 2:
+                self.move_piece(*CASTLING_ROOKS[end])
+        self.history.push(move, captured, castling, ep_square, halfmove_clock, previous_hash)
+        self.halfmove_clock = 0 if kind == PAWN or captured else halfmove_clock + 1
+
+        key = self.hash ^ ZOBRIST_SIDE
+        if ep_square is not None:
+            key ^= ZOBRIST_EP[ep_square & 7]
+            self.ep_square = None
+        self.castling &= CASTLING_MASKS[start] & CASTLING_MASKS[end]
+        if self.castling != castling:
+            key ^= ZOBRIST_CASTLING[castling] ^ ZOBRIST_CASTLING[self.castling]
+        if kind == PAWN and abs(end - start) == 16:
+            if PAWN_ATTACKS[code >> 3][(start + end) >> 1] & self.bitboards[code ^ 8]:
+                self.ep_square = (start + end) >> 1
+                key ^= ZOBRIST_EP[end & 7]
+        self.hash = key
+        self.side_to_move ^= 1
+        self.repetitions[key] = self.repetitions.get(key, 0) + 1
+        return captured
+
+    def unmake_move(self):
+        count = self.repetitions[self.hash] - 1
+        if count:
+            self.repetitions[self.hash] = count
+        else:
+            del self.repetitions[self.hash]
+        move, captured, castling, ep_square, halfmove_clock, key = self.history.pop()
+        start, end = move & 63, (move >> 6) & 63
+        code = self.remove_piece(end)
+        if move >> 12:
+            code = PAWN | (code & 8)
+        self.put_piece(start, code)
+        if captured:
+            self.put_piece(end ^ 8 if code & 7 == PAWN and end == ep_square else end, captured)
+        elif code & 7 == KING and abs(end - start) == 2:
+            rook_start, rook_end = CASTLING_ROOKS[end]
+            self.move_piece(rook_end, rook_start)
+        self.castling = castling
+        self.ep_square = ep_square
+        self.halfmove_clock = halfmove_clock
+        self.hash = key
+        self.side_to_move ^= 1
+        return move
+
+    def repetition_count(self):
+        return self.repetitions.get(self.hash, 0)
+
+    def is_threefold_repetition(self):
+        return self.repetitions.get(self.hash, 0) >= 3
+
+    def is_fifty_move_draw(self):
+        return self.halfmove_clock >= FIFTY_MOVE_PLIES
+
+    def is_insufficient_material(self):
+        bitboards = self.bitboards
+        if (bitboards[PAWN] | bitboards[ROOK] | bitboards[QUEEN]
+                | bitboards[8 | PAWN] | bitboards[8 | ROOK] | bitboards[8 | QUEEN]):
+            return False
+        knights = bitboards[KNIGHT] | bitboards[8 | KNIGHT]
+        bishops = bitboards[BISHOP] | bitboards[8 | BISHOP]
+        minors = knights | bishops
+        if not minors & (minors - 1):
+            return True
+        return not knights and (not bishops & DARK_SQUARES or not bishops & ~DARK_SQUARES)
+
+    def termination(self):
+        color = self.side_to_move
+        if not self.has_legal_move(color):
+            if self.is_in_check(color):
+                return 'checkmate', '0-1' if color == WHITE else '1-0'
+            return 'stalemate', '1/2-1/2'
+        if self.is_insufficient_material():
+            return 'insufficient material', '1/2-1/2'
+        if self.halfmove_clock >= FIFTY_MOVE_PLIES:
+            return 'fifty-move rule', '1/2-1/2'
+        if self.repetitions.get(self.hash, 0) >= 3:
+            return 'threefold repetition', '1/2-1/2'
+        return None
+
+    def attacks_from(self, sq):
+        code = self.squares[sq]
+        kind = code & 7
+        if kind == PAWN:
+            return PAWN_ATTACKS[code >> 3][sq]
+        if kind == KNIGHT:
+            return KNIGHT_ATTACKS[sq]
+        if kind == KING:
+            return KING_ATTACKS[sq]
+        if kind == BISHOP:
+            return slide_attacks(sq, self.occupied, BISHOP_RAYS)
+        if kind == ROOK:
+            return slide_attacks(sq, self.occupied, ROOK_RAYS)
+        if kind == QUEEN:
+            return slide_attacks(sq, self.occupied, QUEEN_RAYS)
+        return 0
+
+    def is_clear_path(self, start, end):
+        between = BETWEEN[start][end]
+        return between is not None and not between & self.occupied
+
+    def move_targets(self, start):
+        code = self.squares[start]
+        if not code:
+            return 0
+        color = code >> 3
+        kind = code & 7
+        if kind == KING:
+            targets = KING_ATTACKS[start] & ~self.occupancy[color]
+            if self.castling & COLOR_CASTLING[color]:
+                targets |= self.castling_targets(start, color)
+            return targets
+        if kind != PAWN:
+            return self.attacks_from(start) & ~self.occupancy[color]
+        targets = PAWN_ATTACKS[color][start] & self.occupancy[1 - color]
+        if self.ep_square is not None and color == self.side_to_move:
+            targets |= PAWN_ATTACKS[color][start] & (1 << self.ep_square)
+        step = 8 if color == WHITE else -8
+        push = start + step
+        if 0 <= push < 64 and not self.squares[push]:
+            targets |= 1 << push
+            start_row = 1 if color == WHITE else 6
+            if start >> 3 == start_row and not self.squares[push + step]:
+                targets |= 1 << (push + step)
+        return targets
+
+    def castling_targets(self, start, color):
+        targets = 0
+        for right, king_start, king_end, _, _, empty, path in CASTLING_PATHS:
+            if (self.castling & right and start == king_start and not empty & self.occupied
+                    and not any(self.attackers_to(sq, color ^ 1) for sq in iter_bits(path))):
+                targets |= 1 << king_end
+        return targets
+
+    def is_valid_move(self, start, end):
+        return start != end and bool(self.move_targets(start) & (1 << end))
+
+    def moves_from(self, start, moves=None):
+        if moves is None:
+            moves = []
+        targets = self.move_targets(start)
+        if targets & PROMOTION_RANKS and self.squares[start] & 7 == PAWN:
+            for end in iter_bits(targets):
+                moves.extend(start | (end << 6) | (kind << 12) for kind in PROMOTION_KINDS)
+        else:
+            for end in iter_bits(targets):
+                moves.append(start | (end << 6))
+        return moves
+
+    def generate_moves(self, color=None):
+        if color is None:
+            color = self.side_to_move
+        moves = []
+        for start in iter_bits(self.occupancy[color]):
+            self.moves_from(start, moves)
+        return moves
+
+    def is_legal(self, move):
+        color = self.squares[move & 63] >> 3
+        self.make_move(move)
+        king_sq = self.king_squares[color]
+        legal = king_sq is None or not self.attackers_to(king_sq, 1 - color)
+        self.unmake_move()
+        return legal
+
+    def position_info(self):
+        cache = self.move_cache
+        if cache is not None:
+            info = cache.probe(self.hash)
+            if info is not None:
+                return info
+        color = self.side_to_move
+        info = (array('H', [move for move in self.generate_moves(color) if self.is_legal(move)]),
+                self.is_in_check(color))
+        if cache is not None:
+            cache.store(self.hash, info)
+        return info
+
+    def legal_moves(self, color=None):
+        if self.move_cache is not None and color in (None, self.side_to_move):
+            return list(self.position_info()[0])
+        return [move for move in self.generate_moves(color) if self.is_legal(move)]
+
+    def legal_moves_from(self, start):
+        if self.move_cache is not None and self.squares[start] >> 3 == self.side_to_move:
+            return [move for move in self.position_info()[0] if move & 63 == start]
+        return [move for move in self.moves_from(start) if self.is_legal(move)]
+
+    def has_legal_move(self, color=None):
+        if color is None:
+            color = self.side_to_move
+        for start in iter_bits(self.occupancy[color]):
+            for end in iter_bits(self.move_targets(start)):
+                if self.is_legal(start | (end << 6)):
+                    return True
+        return False
+
+    def king_square(self, color):
+        return self.king_squares[color]
+
+    # Attack queries look outwards from the target square with one table lookup or ray scan per
+    # piece type, so they need no per-move attack state.
+    def attackers_to(self, sq, by_color):
+        bitboards = self.bitboards
+        base = by_color << 3
+        attackers = ((PAWN_ATTACKS[by_color ^ 1][sq] & bitboards[base | PAWN])
+                     | (KNIGHT_ATTACKS[sq] & bitboards[base | KNIGHT])
+                     | (KING_ATTACKS[sq] & bitboards[base | KING]))
+        queens = bitboards[base | QUEEN]
+        diagonal = bitboards[base | BISHOP] | queens
+        if diagonal:
+            attackers |= slide_attacks(sq, self.occupied, BISHOP_RAYS) & diagonal
+        straight = bitboards[base | ROOK] | queens
+        if straight:
+            attackers |= slide_attacks(sq, self.occupied, ROOK_RAYS) & straight
+        return attackers
+
+    def is_in_check(self, color):
+        king_sq = self.king_squares[color]
+        if king_sq is None:
+            return False
+        return bool(self.attackers_to(king_sq, color ^ 1))
+
+    def is_checkmate(self, color=None):
+        if self.move_cache is not None and color in (None, self.side_to_move):
+            moves, in_check = self.position_info()
+            return in_check and not moves
+        if color is None:
+            color = self.side_to_move
+        return self.is_in_check(color) and not self.has_legal_move(color)
+
+    def is_stalemate(self, color=None):
+        if self.move_cache is not None and color in (None, self.side_to_move):
+            moves, in_check = self.position_info()
+            return not in_check and not moves
+        if color is None:
+            color = self.side_to_move
+        return not self.is_in_check(color) and not self.has_legal_move(color)
+
+
+def validate_position(placement, side_to_move):
+    board = Board()
+    for sq, code in placement:
+        board.put_piece(sq, code)
+    for color, name in ((WHITE, 'White'), (BLACK, 'Black')):
+        if bin(board.bitboards[make_piece(color, KING)]).count('1') != 1:
+            raise ValueError(f"{name} must have exactly one king")
+    if (board.bitboards[PAWN] | board.bitboards[8 | PAWN]) & PROMOTION_RANKS:
+        raise ValueError('Pawns cannot stand on the first or last rank')
+    if board.is_in_check(side_to_move ^ 1):
+        raise ValueError('The side not to move is in check')
+
+
+def validate_ep_square(placement, side_to_move, ep_square):
+    mover = side_to_move ^ 1
+    step = 8 if mover == WHITE else -8
+    codes = dict(placement)
+    if (ep_square >> 3 != (2 if mover == WHITE else 5) or ep_square in codes
+            or ep_square - step in codes or codes.get(ep_square + step) != make_piece(mover, PAWN)):
+        raise ValueError(f"Invalid en passant square: {square_name(ep_square)}")
@@ -0,0 +1,400 @@
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from chess_board import (Board, START_FEN, WHITE, BLACK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING,
+                         PIECE_LETTERS, ZOBRIST_CASTLING, ZOBRIST_PIECES, ZOBRIST_SIDE, iter_bits, make_piece)
+
+BOOK_ENTRY = struct.Struct('>QHHI')
+TABLE_HEADER = struct.Struct('>4sHHII')
+TABLE_ENTRY = struct.Struct('>QH')
+TABLE_MAGIC = b'CEGT'
+TABLE_VERSION = 1
+SIGNATURE_ORDER = (KING, QUEEN, ROOK, BISHOP, KNIGHT, PAWN)
+
+WIN = 1
+DRAW = 0
+LOSS = -1
+
+NO_EXIT = 0
+DRAWN_EXIT = 1
+UNKNOWN_EXIT = 2
+
+
+# Polyglot stores castling as the king capturing its own rook and promotions as 1..4 = knight..queen.
+POLYGLOT_CASTLING = {(4, 7): 6, (4, 0): 2, (60, 63): 62, (60, 56): 58}
+CASTLING_ENTRIES = {(start, end): rook for (start, rook), end in POLYGLOT_CASTLING.items()}
+
+
+def book_move(entry_move, board=None):
+    start, end, promotion = (entry_move >> 6) & 63, entry_move & 63, (entry_move >> 12) & 7
+    if board is not None and board.squares[start] & 7 == KING:
+        end = POLYGLOT_CASTLING.get((start, end), end)
+    return start | (end << 6) | ((promotion + 1 if promotion else 0) << 12)
+
+
+def book_entry_move(move, board=None):
+    start, end, promotion = move & 63, (move >> 6) & 63, move >> 12
+    if board is not None and board.squares[start] & 7 == KING:
+        end = CASTLING_ENTRIES.get((start, end), end)
+    return end | (start << 6) | ((promotion - 1 if promotion else 0) << 12)
+
+
+def material_signature(board):
+    sides = []
+    for color in (WHITE, BLACK):
+        base = color << 3
+        sides.append(''.join(PIECE_LETTERS[kind].upper() * bin(board.bitboards[base | kind]).count('1')
+                             for kind in SIGNATURE_ORDER))
+    return 'v'.join(sides)
+
+
+def mirror_signature(signature):
+    white, _, black = signature.partition('v')
+    return f"{black}v{white}"
+
+
+def parse_signature(signature):
+    white, separator, black = signature.upper().partition('V')
+    if not separator or not white.startswith('K') or not black.startswith('K'):
+        raise ValueError(f"Invalid material signature: {signature}")
+    codes = []
+    for color, letters in ((WHITE, white), (BLACK, black)):
+        if letters.count('K') != 1:
+            raise ValueError(f"Invalid material signature: {signature}")
+        for letter in letters:
+            kind = PIECE_LETTERS.find(letter.lower())
+            if kind <= 0:
+                raise ValueError(f"Invalid material signature: {signature}")
+            if kind == PAWN:
+                raise ValueError(f"Pawn endgames are not supported: {signature}")
+            codes.append(make_piece(color, kind))
+    return sorted(codes, key=lambda code: (code >> 3, SIGNATURE_ORDER.index(code & 7)))
+
+
+def codes_signature(codes):
+    return 'v'.join(''.join(PIECE_LETTERS[code & 7].upper() for code in codes if code >> 3 == color)
+                    for color in (WHITE, BLACK))
+
+
+def mirrored_key(board):
+    key = ZOBRIST_CASTLING[0]
+    if board.side_to_move == WHITE:
+        key ^= ZOBRIST_SIDE
+    squares = board.squares
+    for sq in iter_bits(board.occupied):
+        key ^= ZOBRIST_PIECES[squares[sq] ^ 8][sq ^ 56]
+    return key
+
+
+class MappedFile:
+    def __init__(self, path, entry, offset=0):
+        self.path = path
+        self.entry = entry
+        self.offset = offset
+        self.file = open(path, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self.count = max(size - offset, 0) // entry.size
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def key_at(self, index):
+        return struct.unpack_from('>Q', self.data, self.offset + index * self.entry.size)[0]
+
+    def lower_bound(self, key):
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) >> 1
+            if self.key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def entries(self, key):
+        index = self.lower_bound(key)
+        while index < self.count:
+            entry = self.entry.unpack_from(self.data, self.offset + index * self.entry.size)
+            if entry[0] != key:
+                break
+            yield entry
+            index += 1
+
+
+class OpeningBook(MappedFile):
+    def __init__(self, path, seed=None):
+        MappedFile.__init__(self, path, BOOK_ENTRY)
+        self.rng = random.Random(seed)
+
+    def probe(self, board):
+        return [(book_move(move, board), weight) for _, move, weight, _ in self.entries(board.hash)]
+
+    def choose_move(self, board, best=False):
+        candidates = [(move, weight) for move, weight in self.probe(board)
+                      if weight and move in board.legal_moves_from(move & 63)]
+        if not candidates:
+            return 0
+        if best:
+            return max(candidates, key=lambda candidate: candidate[1])[0]
+        pick = self.rng.randrange(sum(weight for _, weight in candidates))
+        for move, weight in candidates:
+            pick -= weight
+            if pick < 0:
+                return move
+        return candidates[-1][0]
+
+
+class EndgameTable(MappedFile):
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            magic, version, _, count, text_size = TABLE_HEADER.unpack(f.read(TABLE_HEADER.size))
+            if magic != TABLE_MAGIC or version != TABLE_VERSION:
+                raise ValueError(f"Not an endgame table: {path}")
+            text = f.read(text_size).decode('ascii')
+        MappedFile.__init__(self, path, TABLE_ENTRY, TABLE_HEADER.size + text_size)
+        self.signatures = {}
+        for item in filter(None, text.split(',')):
+            signature, _, complete = item.partition(':')
+            self.signatures[signature] = complete == '1'
+        self.max_pieces = max((len(signature) - 1 for signature in self.signatures), default=0)
+
+    def probe(self, board):
+        if board.castling or board.ep_square is not None:
+            return None
+        signature = material_signature(board)
+        if signature in self.signatures:
+            key, complete = board.hash, self.signatures[signature]
+        else:
+            complete = self.signatures.get(mirror_signature(signature))
+            if complete is None:
+                return None
+            key = mirrored_key(board)
+        for _, value in self.entries(key):
+            return (WIN if value & 1 else LOSS), value >> 1
+        return (DRAW, 0) if complete else None
+
+
+def build_book(games, path, max_plies=20):
+    from chess_notation import parse_san
+    from chess_pgn import iter_san_tokens
+
+    weights = {}
+    board = Board()
+    for game in games:
+        try:
+            board.set_fen(game.headers.get('FEN', START_FEN))
+        except ValueError:
+            continue
+        result = game.headers.get('Result', '*')
+        for ply, token in enumerate(iter_san_tokens(game.movetext)):
+            if ply >= max_plies or token in ('1-0', '0-1', '1/2-1/2', '*'):
+                break
+            try:
+                move = parse_san(board, token)
+            except ValueError:
+                break
+            winner = '1-0' if board.side_to_move == WHITE else '0-1'
+            score = 2 if result == winner else 1 if result == '1/2-1/2' else 0
+            entry = (board.hash, book_entry_move(move, board))
+            weights[entry] = min(weights.get(entry, 0) + score, 0xFFFF)
+            board.make_move(move)
+
+    with open(path, 'wb') as f:
+        for (key, move), weight in sorted(weights.items(), key=lambda item: (item[0][0], -item[1])):
+            f.write(BOOK_ENTRY.pack(key, move, weight, 0))
+    return len(weights)
+
+
+def _expand_positions(codes, first_square):
+    board = Board()
+    positions = []
+    count = len(codes)
+    squares = [first_square] + [0] * (count - 1)
+
+    def place(index, used):
+        if index == count:
+            for side in (WHITE, BLACK):
+                expand(side)
+            return
+        for sq in range(64):
+            if used >> sq & 1:
+                continue
+            if codes[index] == codes[index - 1] and sq < squares[index - 1]:
+                continue
+            squares[index] = sq
+            place(index + 1, used | (1 << sq))
+
+    def expand(side):
+        board.clear()
+        for sq, code in zip(squares, codes):
+            board.put_piece(sq, code)
+        board.side_to_move = side
+        if board.is_in_check(side ^ 1):
+            return
+        board.hash = board.compute_hash()
+        key = board.hash
+        moves = board.legal_moves()
+        children = array('Q')
+        exit_kind = NO_EXIT
+        for move in moves:
+            if board.make_move(move):
+                exit_kind = max(exit_kind, DRAWN_EXIT if board.is_insufficient_material() else UNKNOWN_EXIT)
+            else:
+                children.append(board.hash)
+            board.unmake_move()
+        mated = not moves and board.is_in_check(side)
+        positions.append((key, mated, exit_kind, children))
+
+    place(1, 1 << first_square)
+    return positions
+
+
+def solve_signature(signature, workers=1):
+    codes = parse_signature(signature)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            batches = list(executor.map(_expand_positions, [codes] * 64, range(64)))
+    else:
+        batches = [_expand_positions(codes, sq) for sq in range(64)]
+
+    index = {}
+    for batch in batches:
+        for position in batch:
+            index[position[0]] = len(index)
+    total = len(index)
+    keys = array('Q', bytes(8 * total))
+    remaining = array('I', bytes(4 * total))
+    blocked = bytearray(total)
+    parent_counts = array('I', bytes(4 * (total + 1)))
+    frontier = []
+    for batch in batches:
+        for key, mated, exit_kind, children in batch:
+            i = index[key]
+            keys[i] = key
+            remaining[i] = len(children)
+            blocked[i] = exit_kind != NO_EXIT
+            if mated:
+                frontier.append(i)
+            for child in children:
+                parent_counts[index[child] + 1] += 1
+    for i in range(total):
+        parent_counts[i + 1] += parent_counts[i]
+    parents = array('I', bytes(4 * parent_counts[total]))
+    fill = array('I', parent_counts)
+    complete = True
+    for batch in batches:
+        for key, mated, exit_kind, children in batch:
+            i = index[key]
+            complete = complete and exit_kind != UNKNOWN_EXIT
+            for child in children:
+                slot = index[child]
+                parents[fill[slot]] = i
+                fill[slot] += 1
+    del batches, index
+
+    results = bytearray(total)
+    plies = array('H', bytes(2 * total))
+    for i in frontier:
+        results[i] = 2
+    depth = 0
+    while frontier:
+        next_frontier = []
+        for child in frontier:
+            child_lost = results[child] == 2
+            for slot in range(parent_counts[child], parent_counts[child + 1]):
+                parent = parents[slot]
+                if results[parent]:
+                    continue
+                if child_lost:
+                    results[parent] = 1
+                else:
+                    remaining[parent] -= 1
+                    if remaining[parent] or blocked[parent]:
+                        continue
+                    results[parent] = 2
+                plies[parent] = depth + 1
+                next_frontier.append(parent)
+        frontier = next_frontier
+        depth += 1
+
+    entries = [(keys[i], plies[i] * 2 + (results[i] == 1)) for i in range(total) if results[i]]
+    return entries, complete
+
+
+def build_endgame_table(signatures, path, workers=1):
+    entries = []
+    names = []
+    for signature in signatures:
+        solved, complete = solve_signature(signature, workers)
+        entries.extend(solved)
+        names.append(f"{codes_signature(parse_signature(signature))}:{int(complete)}")
+    entries.sort()
+    text = ','.join(names).encode('ascii')
+    with open(path, 'wb') as f:
+        f.write(TABLE_HEADER.pack(TABLE_MAGIC, TABLE_VERSION, 0, len(entries), len(text)))
+        f.write(text)
+        for key, value in entries:
+            f.write(TABLE_ENTRY.pack(key, value))
+    return len(entries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build or probe opening books and endgame tables.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    book = commands.add_parser('book', help='build an opening book from a PGN file')
+    book.add_argument('pgn')
+    book.add_argument('output')
+    book.add_argument('--plies', type=int, default=20)
+    endgame = commands.add_parser('endgame', help='build an endgame table, e.g. KQvK KRvK')
+    endgame.add_argument('output')
+    endgame.add_argument('signatures', nargs='+')
+    endgame.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    probe = commands.add_parser('probe', help='look a position up in a book or endgame table')
+    probe.add_argument('path')
+    probe.add_argument('--fen', default=START_FEN)
+    args = parser.parse_args(argv)
+
+    if args.command == 'book':
+        from chess_pgn import iter_pgn_games
+        with open(args.pgn, encoding='utf-8', errors='replace') as f:
+            count = build_book(iter_pgn_games(f), args.output, args.plies)
+        print(f"{count} book entries written to {args.output}", file=sys.stderr)
+    elif args.command == 'endgame':
+        count = build_endgame_table(args.signatures, args.output, args.workers)
+        print(f"{count} decisive positions written to {args.output}", file=sys.stderr)
+    else:
+        board = Board()
+        board.set_fen(args.fen)
+        with open(args.path, 'rb') as f:
+            is_table = f.read(4) == TABLE_MAGIC
+        if is_table:
+            with EndgameTable(args.path) as table:
+                print(table.probe(board))
+        else:
+            with OpeningBook(args.path) as opening_book:
+                from chess_notation import move_to_san
+                for move, weight in opening_book.probe(board):
+                    print(move_to_san(board, move), weight)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
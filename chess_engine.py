@@ -0,0 +1,382 @@
+import time
+
+from chess_board import WHITE, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, FIFTY_MOVE_PLIES, PROMOTION_RANKS, iter_bits
+from chess_book import EndgameTable, OpeningBook, WIN, LOSS
+from chess_tt import TranspositionTable, DEPTH_PREFERRED
+
+PIECE_VALUES = (0, 100, 320, 330, 500, 900, 0)
+MATE_SCORE = 100000
+MATE_BOUND = MATE_SCORE - 1000
+INFINITY = 1000000
+MAX_PLY = 128
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Tables are written from rank 8 down to rank 1, as seen by white.
+PAWN_TABLE = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    10, 10, 20, 30, 30, 20, 10, 10,
+    5, 5, 10, 25, 25, 10, 5, 5,
+    0, 0, 0, 20, 20, 0, 0, 0,
+    5, -5, -10, 0, 0, -10, -5, 5,
+    5, 10, 10, -20, -20, 10, 10, 5,
+    0, 0, 0, 0, 0, 0, 0, 0,
+)
+KNIGHT_TABLE = (
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20, 0, 0, 0, 0, -20, -40,
+    -30, 0, 10, 15, 15, 10, 0, -30,
+    -30, 5, 15, 20, 20, 15, 5, -30,
+    -30, 0, 15, 20, 20, 15, 0, -30,
+    -30, 5, 10, 15, 15, 10, 5, -30,
+    -40, -20, 0, 5, 5, 0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50,
+)
+BISHOP_TABLE = (
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 10, 10, 5, 0, -10,
+    -10, 5, 5, 10, 10, 5, 5, -10,
+    -10, 0, 10, 10, 10, 10, 0, -10,
+    -10, 10, 10, 10, 10, 10, 10, -10,
+    -10, 5, 0, 0, 0, 0, 5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20,
+)
+ROOK_TABLE = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    5, 10, 10, 10, 10, 10, 10, 5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    0, 0, 0, 5, 5, 0, 0, 0,
+)
+QUEEN_TABLE = (
+    -20, -10, -10, -5, -5, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 5, 5, 5, 0, -10,
+    -5, 0, 5, 5, 5, 5, 0, -5,
+    0, 0, 5, 5, 5, 5, 0, -5,
+    -10, 5, 5, 5, 5, 5, 0, -10,
+    -10, 0, 5, 0, 0, 0, 0, -10,
+    -20, -10, -10, -5, -5, -10, -10, -20,
+)
+KING_TABLE = (
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+    20, 20, 0, 0, 0, 0, 20, 20,
+    20, 30, 10, 0, 0, 10, 30, 20,
+)
+
+
+def _square_tables(table, value):
+    white = [0] * 64
+    black = [0] * 64
+    for sq in range(64):
+        x, y = sq & 7, sq >> 3
+        white[sq] = value + table[(7 - y) * 8 + x]
+        black[sq] = value + table[y * 8 + x]
+    return white, black
+
+
+PIECE_SQUARE = [None] * 16
+for _kind, _table in ((PAWN, PAWN_TABLE), (KNIGHT, KNIGHT_TABLE), (BISHOP, BISHOP_TABLE),
+                      (ROOK, ROOK_TABLE), (QUEEN, QUEEN_TABLE), (KING, KING_TABLE)):
+    PIECE_SQUARE[_kind], PIECE_SQUARE[_kind | 8] = _square_tables(_table, PIECE_VALUES[_kind])
+
+
+def evaluate(board):
+    score = 0
+    bitboards = board.bitboards
+    for code in range(1, 7):
+        table = PIECE_SQUARE[code]
+        for sq in iter_bits(bitboards[code]):
+            score += table[sq]
+        table = PIECE_SQUARE[code | 8]
+        for sq in iter_bits(bitboards[code | 8]):
+            score -= table[sq]
+    return score if board.side_to_move == WHITE else -score
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class SearchResult:
+    __slots__ = ('move', 'score', 'depth', 'nodes', 'elapsed', 'pv')
+
+    def __init__(self, move, score, depth, nodes, elapsed, pv):
+        self.move = move
+        self.score = score
+        self.depth = depth
+        self.nodes = nodes
+        self.elapsed = elapsed
+        self.pv = pv
+
+    def __repr__(self):
+        return f"SearchResult(move={self.move}, score={self.score}, depth={self.depth}, nodes={self.nodes})"
+
+
+class Engine:
+    def __init__(self, time_limit=1.0, node_limit=None, max_depth=MAX_PLY - 1,
+                 tt_size=16 * 1024 * 1024, tt_policy=DEPTH_PREFERRED, book=None, endgame=None):
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.max_depth = max_depth
+        self.tt = TranspositionTable(tt_size, tt_policy)
+        self.book = OpeningBook(book) if isinstance(book, str) else book
+        self.endgame = EndgameTable(endgame) if isinstance(endgame, str) else endgame
+        self.endgame_pieces = self.endgame.max_pieces if self.endgame is not None else 0
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+        self.history = [[0] * 64 for _ in range(16)]
+        self.nodes = 0
+        self.deadline = None
+        self.max_nodes = None
+        self.stop = None
+        self.iterations = []
+
+    def choose_move(self, board):
+        return self.search(board).move
+
+    def search(self, board, time_limit=None, node_limit=None, max_depth=None, root_moves=None):
+        time_limit = self.time_limit if time_limit is None else time_limit
+        self.max_nodes = self.node_limit if node_limit is None else node_limit
+        max_depth = self.max_depth if max_depth is None else max_depth
+        start = time.perf_counter()
+        self.deadline = start + time_limit if time_limit is not None else None
+        self.nodes = 0
+        self.tt.new_search()
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+        for row in self.history:
+            for sq in range(64):
+                row[sq] >>= 1
+
+        self.iterations = []
+        restricted = root_moves is not None
+        if root_moves is None:
+            root_moves = board.legal_moves()
+        else:
+            root_moves = list(root_moves)
+        if not root_moves:
+            return SearchResult(0, -MATE_SCORE if board.is_in_check(board.side_to_move) else 0,
+                                0, 0, time.perf_counter() - start, [])
+        if self.book is not None:
+            move = self.book.choose_move(board)
+            if move in root_moves:
+                return SearchResult(move, 0, 0, 0, time.perf_counter() - start, [move])
+
+        best_move, best_score, completed = root_moves[0], 0, 0
+        base_ply = len(board.history)
+        for depth in range(1, max_depth + 1):
+            try:
+                score, move = self._search_root(board, depth, root_moves, best_move)
+            except SearchTimeout:
+                while len(board.history) > base_ply:
+                    board.unmake_move()
+                break
+            best_move, best_score, completed = move, score, depth
+            self.iterations.append((move, score))
+            if abs(best_score) >= MATE_BOUND or (len(root_moves) == 1 and not restricted):
+                break
+            if self.deadline is not None and time.perf_counter() - start > time_limit / 2:
+                break
+
+        return SearchResult(best_move, best_score, completed, self.nodes, time.perf_counter() - start,
+                            self.principal_variation(board, best_move, completed))
+
+    def principal_variation(self, board, first_move, depth):
+        pv = []
+        move = first_move
+        while move and len(pv) < max(depth, 1) and move in board.legal_moves():
+            pv.append(move)
+            board.make_move(move)
+            entry = self.tt.probe(board.hash)
+            move = entry[3] if entry else 0
+        for _ in pv:
+            board.unmake_move()
+        return pv
+
+    def _search_root(self, board, depth, root_moves, best_move):
+        alpha, beta = -INFINITY, INFINITY
+        root_moves.sort(key=lambda move: move != best_move)
+        best_score = -INFINITY
+        for move in root_moves:
+            board.make_move(move)
+            score = -self._negamax(board, depth - 1, -beta, -alpha, 1)
+            board.unmake_move()
+            if score > best_score:
+                best_score, best_move = score, move
+            if score > alpha:
+                alpha = score
+        self.tt.store(board.hash, (depth, best_score, EXACT, best_move), depth)
+        return best_score, best_move
+
+    def _check_limits(self):
+        if self.stop is not None and self.stop.is_set():
+            raise SearchTimeout()
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            raise SearchTimeout()
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise SearchTimeout()
+
+    def _negamax(self, board, depth, alpha, beta, ply):
+        self.nodes += 1
+        if not self.nodes & 255:
+            self._check_limits()
+        if board.repetition_count() > 1 or board.halfmove_clock >= FIFTY_MOVE_PLIES:
+            return 0
+        if self.endgame_pieces and bin(board.occupied).count('1') <= self.endgame_pieces:
+            known = self.endgame.probe(board)
+            if known is not None:
+                result, plies = known
+                if result == WIN:
+                    return MATE_SCORE - ply - plies
+                if result == LOSS:
+                    return -MATE_SCORE + ply + plies
+                return 0
+
+        side = board.side_to_move
+        king_sq = board.king_squares[side]
+        in_check = king_sq is not None and bool(board.attackers_to(king_sq, side ^ 1))
+        if in_check:
+            depth += 1
+        if depth <= 0 or ply >= MAX_PLY - 1:
+            return self._quiesce(board, alpha, beta, ply)
+
+        original_alpha = alpha
+        tt_move = 0
+        entry = self.tt.probe(board.hash)
+        if entry is not None:
+            entry_depth, score, flag, tt_move = entry
+            if entry_depth >= depth:
+                score = _score_from_tt(score, ply)
+                if flag == EXACT:
+                    return score
+                if flag == LOWER and score >= beta:
+                    return score
+                if flag == UPPER and score <= alpha:
+                    return score
+
+        best_score, best_move, legal = -INFINITY, 0, 0
+        for move in self._order_moves(board, board.generate_moves(side), tt_move, ply):
+            captured = board.make_move(move)
+            own_king = board.king_squares[side]
+            if own_king is not None and board.attackers_to(own_king, side ^ 1):
+                board.unmake_move()
+                continue
+            legal += 1
+            score = -self._negamax(board, depth - 1, -beta, -alpha, ply + 1)
+            board.unmake_move()
+            if score > best_score:
+                best_score, best_move = score, move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        if not captured:
+                            self._record_quiet_cutoff(board, move, depth, ply)
+                        break
+
+        if not legal:
+            return -MATE_SCORE + ply if in_check else 0
+
+        if best_score <= original_alpha:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.tt.store(board.hash, (depth, _score_to_tt(best_score, ply), flag, best_move), depth)
+        return best_score
+
+    def _quiesce(self, board, alpha, beta, ply):
+        self.nodes += 1
+        if not self.nodes & 255:
+            self._check_limits()
+        stand_pat = evaluate(board)
+        if stand_pat >= beta or ply >= MAX_PLY - 1:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        side = board.side_to_move
+        squares = board.squares
+        enemy = board.occupancy[side ^ 1]
+        captures = []
+        for start in iter_bits(board.occupancy[side]):
+            targets = board.move_targets(start)
+            if targets & PROMOTION_RANKS and squares[start] & 7 == PAWN:
+                for end in iter_bits(targets):
+                    captures.append((PIECE_VALUES[squares[end] & 7] * 10 + PIECE_VALUES[QUEEN],
+                                     start | (end << 6) | (QUEEN << 12)))
+                continue
+            for end in iter_bits(targets & enemy):
+                captures.append((PIECE_VALUES[squares[end] & 7] * 10 - PIECE_VALUES[squares[start] & 7],
+                                 start | (end << 6)))
+        captures.sort(reverse=True)
+        for _, move in captures:
+            board.make_move(move)
+            own_king = board.king_squares[side]
+            if own_king is not None and board.attackers_to(own_king, side ^ 1):
+                board.unmake_move()
+                continue
+            score = -self._quiesce(board, -beta, -alpha, ply + 1)
+            board.unmake_move()
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    def _order_moves(self, board, moves, tt_move, ply):
+        squares = board.squares
+        killers = self.killers[ply]
+        history = self.history
+        scored = []
+        for move in moves:
+            start, end = move & 63, (move >> 6) & 63
+            if move == tt_move:
+                key = 1 << 30
+            elif squares[end] or move >> 12:
+                key = ((1 << 20) + PIECE_VALUES[squares[end] & 7] * 10 + PIECE_VALUES[move >> 12]
+                       - PIECE_VALUES[squares[start] & 7])
+            elif move == killers[0]:
+                key = (1 << 19) + 1
+            elif move == killers[1]:
+                key = 1 << 19
+            else:
+                key = history[squares[start]][end]
+            scored.append((key, move))
+        scored.sort(reverse=True)
+        return [move for _, move in scored]
+
+    def _record_quiet_cutoff(self, board, move, depth, ply):
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        row = self.history[board.squares[move & 63]]
+        row[(move >> 6) & 63] = min(row[(move >> 6) & 63] + depth * depth, 1 << 18)
+
+
+def _score_to_tt(score, ply):
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def _score_from_tt(score, ply):
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
@@ -0,0 +1,64 @@
+from array import array
+
+NO_SQUARE = 64
+
+
+MAX_HALFMOVE_CLOCK = (1 << 17) - 1
+
+
+def pack_state(captured, castling, ep_square, halfmove_clock=0):
+    return (captured | (castling << 4) | ((NO_SQUARE if ep_square is None else ep_square) << 8)
+            | (min(halfmove_clock, MAX_HALFMOVE_CLOCK) << 15))
+
+
+def unpack_state(state):
+    ep_square = (state >> 8) & 127
+    return state & 15, (state >> 4) & 15, None if ep_square == NO_SQUARE else ep_square, state >> 15
+
+
+class MoveHistory:
+    def __init__(self):
+        self.moves = array('H')
+        self.states = array('I')
+        self.hashes = array('Q')
+        self.redo_moves = array('H')
+
+    def __len__(self):
+        return len(self.moves)
+
+    def __iter__(self):
+        return iter(self.moves)
+
+    def __getitem__(self, ply):
+        return self.moves[ply]
+
+    def clear(self):
+        del self.moves[:]
+        del self.states[:]
+        del self.hashes[:]
+        del self.redo_moves[:]
+
+    def push(self, move, captured, castling, ep_square, halfmove_clock, key):
+        self.moves.append(move)
+        self.states.append(pack_state(captured, castling, ep_square, halfmove_clock))
+        self.hashes.append(key)
+
+    def pop(self):
+        move = self.moves.pop()
+        captured, castling, ep_square, halfmove_clock = unpack_state(self.states.pop())
+        return move, captured, castling, ep_square, halfmove_clock, self.hashes.pop()
+
+    def last_move(self):
+        return self.moves[-1] if self.moves else None
+
+    def push_redo(self, move):
+        self.redo_moves.append(move)
+
+    def pop_redo(self):
+        return self.redo_moves.pop() if self.redo_moves else None
+
+    def clear_redo(self):
+        del self.redo_moves[:]
+
+    def can_redo(self):
+        return len(self.redo_moves) > 0
@@ -0,0 +1,96 @@
+import atexit
+import json
+import logging
+import os
+import time
+
+log = logging.getLogger('chess')
+
+
+class _NullPhase:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        self.counters = {}
+        self.timers = {}
+        self.started = time.time()
+
+    def configure(self, log_level=None, enabled=None, export_path=None):
+        if log_level:
+            logging.basicConfig(format='%(asctime)s %(name)s %(levelname)s %(message)s')
+            log.setLevel(log_level.upper() if isinstance(log_level, str) else log_level)
+        if enabled is not None:
+            self.enabled = enabled
+        if export_path:
+            atexit.register(self.export, export_path)
+
+    @property
+    def debug(self):
+        return log.isEnabledFor(logging.DEBUG)
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_time(self, name, elapsed):
+        timer = self.timers.get(name)
+        if timer is None:
+            self.timers[name] = [1, elapsed, elapsed]
+        else:
+            timer[0] += 1
+            timer[1] += elapsed
+            if elapsed > timer[2]:
+                timer[2] = elapsed
+
+    def phase(self, name):
+        if not self.enabled:
+            return NULL_PHASE
+        return _Phase(self, name)
+
+    def reset(self):
+        self.counters = {}
+        self.timers = {}
+        self.started = time.time()
+
+    def snapshot(self):
+        return {
+            'started': self.started,
+            'uptime': time.time() - self.started,
+            'counters': dict(self.counters),
+            'timers': {name: {'calls': calls, 'total': total, 'mean': total / calls, 'max': longest}
+                       for name, (calls, total, longest) in self.timers.items()},
+        }
+
+    def export(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.snapshot(), f, indent=2, sort_keys=True)
+
+
+metrics = Metrics()
+metrics.configure(os.environ.get('CHESS_LOG_LEVEL'),
+                  os.environ.get('CHESS_METRICS', '') not in ('', '0') or bool(os.environ.get('CHESS_METRICS_FILE')),
+                  os.environ.get('CHESS_METRICS_FILE'))
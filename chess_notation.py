@@ -0,0 +1,117 @@
+import re
+
+from chess_board import PAWN, KING, PIECE_LETTERS, iter_bits, parse_square, square_name
+
+RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+
+SAN_PATTERN = re.compile(r'^([NBRQK])?([a-h])?([1-8])?(x)?([a-h][1-8])(=?[NBRQ])?$')
+CASTLING_SAN = {'O-O': 2, 'O-O-O': -2, '0-0': 2, '0-0-0': -2}
+
+
+def move_to_uci(move):
+    return square_name(move & 63) + square_name((move >> 6) & 63) + PIECE_LETTERS[move >> 12].strip()
+
+
+def parse_uci(text):
+    if len(text) not in (4, 5) or (len(text) == 5 and text[4] not in 'nbrq'):
+        raise ValueError(f"Unsupported move: {text}")
+    promotion = PIECE_LETTERS.index(text[4]) if len(text) == 5 else 0
+    return parse_square(text[:2]) | (parse_square(text[2:4]) << 6) | (promotion << 12)
+
+
+def move_to_san(board, move, check=True):
+    start, end = move & 63, (move >> 6) & 63
+    code = board.squares[start]
+    capture = bool(board.squares[end])
+    if code & 7 == PAWN:
+        capture = capture or end == board.ep_square
+        san = (square_name(start)[0] + 'x' if capture else '') + square_name(end)
+        if move >> 12:
+            san += '=' + PIECE_LETTERS[move >> 12].upper()
+    elif code & 7 == KING and abs(end - start) == 2:
+        san = 'O-O' if end > start else 'O-O-O'
+    else:
+        san = PIECE_LETTERS[code & 7].upper()
+        rivals = [other for other in iter_bits(board.bitboards[code] & ~(1 << start))
+                  if board.is_valid_move(other, end) and board.is_legal(other | (end << 6))]
+        if rivals:
+            if all(other & 7 != start & 7 for other in rivals):
+                san += square_name(start)[0]
+            elif all(other >> 3 != start >> 3 for other in rivals):
+                san += square_name(start)[1]
+            else:
+                san += square_name(start)
+        san += ('x' if capture else '') + square_name(end)
+    if not check:
+        return san
+    board.make_move(move)
+    if board.is_in_check(board.side_to_move):
+        san += '#' if not board.has_legal_move() else '+'
+    board.unmake_move()
+    return san
+
+
+def parse_san(board, san):
+    text = san.rstrip('+#!?')
+    if text in CASTLING_SAN:
+        for move in board.legal_moves():
+            start = move & 63
+            if board.squares[start] & 7 == KING and ((move >> 6) & 63) - start == CASTLING_SAN[text]:
+                return move
+        raise ValueError(f"Illegal move: {san}")
+    match = SAN_PATTERN.match(text)
+    if not match:
+        raise ValueError(f"Unsupported move: {san}")
+    letter, from_file, from_rank, capture, target, promotion = match.groups()
+    kind = PIECE_LETTERS.index(letter.lower()) if letter else PAWN
+    promotion = PIECE_LETTERS.index(promotion[-1].lower()) if promotion else 0
+    end = parse_square(target)
+    candidates = []
+    for move in board.legal_moves():
+        start = move & 63
+        if (move >> 6) & 63 != end or board.squares[start] & 7 != kind or move >> 12 != promotion:
+            continue
+        if from_file and 'abcdefgh'[start & 7] != from_file:
+            continue
+        if from_rank and str((start >> 3) + 1) != from_rank:
+            continue
+        candidates.append(move)
+    if len(candidates) != 1:
+        raise ValueError(f"{'Ambiguous' if candidates else 'Illegal'} move: {san}")
+    return candidates[0]
+
+
+def moves_to_san(board, moves):
+    sans = []
+    for move in moves:
+        sans.append(move_to_san(board, move))
+        board.make_move(move)
+    for _ in moves:
+        board.unmake_move()
+    return sans
+
+
+def format_pgn(headers, sans, result='*', start_ply=0):
+    lines = [f'[{name} "{value}"]' for name, value in headers.items()]
+    if 'Result' not in headers:
+        lines.append(f'[Result "{result}"]')
+    tokens = []
+    for i, san in enumerate(sans):
+        ply = start_ply + i
+        if ply % 2 == 0:
+            tokens.append(f"{ply // 2 + 1}.")
+        elif i == 0:
+            tokens.append(f"{ply // 2 + 1}...")
+        tokens.append(san)
+    tokens.append(result)
+
+    movetext = []
+    line = ''
+    for token in tokens:
+        if line and len(line) + len(token) + 1 > 79:
+            movetext.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    movetext.append(line)
+    return '\n'.join(lines) + '\n\n' + '\n'.join(movetext) + '\n'
@@ -0,0 +1,264 @@
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from chess_board import Board
+from chess_book import OpeningBook
+from chess_engine import Engine, SearchResult, MATE_BOUND, PIECE_VALUES
+from chess_notation import format_pgn, moves_to_san
+
+
+def _search_worker(fen, repetitions, root_moves, config, time_limit, node_limit, max_depth):
+    board = Board()
+    board.set_fen(fen)
+    board.repetitions = repetitions
+    engine = Engine(**config)
+    result = engine.search(board, time_limit=time_limit, node_limit=node_limit,
+                           max_depth=max_depth, root_moves=root_moves)
+    return result.move, result.score, result.depth, result.nodes, result.pv, engine.iterations
+
+
+def best_at_common_depth(results):
+    # Scores from different iteration depths are not comparable, so every worker is judged at the
+    # deepest iteration all of them completed. A proven mate stays valid at any depth.
+    searched = [result for result in results if result[5]]
+    if not searched:
+        move, score, depth, _, pv, _ = results[0]
+        return move, score, depth, pv
+    open_depths = [len(iterations) for *_, iterations in searched if abs(iterations[-1][1]) < MATE_BOUND]
+    depth = min(open_depths) if open_depths else max(len(iterations) for *_, iterations in searched)
+    best = None
+    for move, _, _, _, pv, iterations in searched:
+        depth_move, depth_score = iterations[min(depth, len(iterations)) - 1]
+        if best is None or depth_score > best[1]:
+            best = (depth_move, depth_score, min(depth, len(iterations)), pv if depth_move == move else [depth_move])
+    return best
+
+
+def split_root_moves(board, moves, parts):
+    squares = board.squares
+    ordered = sorted(moves, key=lambda move: -PIECE_VALUES[squares[(move >> 6) & 63] & 7])
+    groups = [ordered[i::parts] for i in range(parts)]
+    return [group for group in groups if group]
+
+
+class ParallelEngine:
+    def __init__(self, workers=None, time_limit=1.0, node_limit=None, max_depth=None, **config):
+        self.workers = workers or os.cpu_count() or 1
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.max_depth = max_depth
+        self.config = config
+        book = config.get('book')
+        self.book = OpeningBook(book) if isinstance(book, str) else book
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    def close(self):
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def choose_move(self, board):
+        return self.search(board).move
+
+    def search(self, board, time_limit=None, node_limit=None, max_depth=None):
+        start = time.perf_counter()
+        moves = board.legal_moves()
+        if len(moves) <= 1:
+            return SearchResult(moves[0] if moves else 0, 0, 0, 0, time.perf_counter() - start, moves)
+        if self.book is not None:
+            move = self.book.choose_move(board)
+            if move in moves:
+                return SearchResult(move, 0, 0, 0, time.perf_counter() - start, [move])
+
+        time_limit = self.time_limit if time_limit is None else time_limit
+        node_limit = self.node_limit if node_limit is None else node_limit
+        max_depth = self.max_depth if max_depth is None else max_depth
+        fen = board.fen()
+        futures = [self.executor.submit(_search_worker, fen, dict(board.repetitions), group, self.config,
+                                        time_limit, node_limit, max_depth)
+                   for group in split_root_moves(board, moves, self.workers)]
+
+        results = [future.result() for future in futures]
+        nodes = sum(result[3] for result in results)
+        move, score, depth, pv = best_at_common_depth(results)
+        return SearchResult(move, score, depth, nodes, time.perf_counter() - start, pv)
+
+
+class GameResult:
+    def __init__(self, index, white, black, result, termination, plies, pgn, nodes, elapsed):
+        self.index = index
+        self.white = white
+        self.black = black
+        self.result = result
+        self.termination = termination
+        self.plies = plies
+        self.pgn = pgn
+        self.nodes = nodes
+        self.elapsed = elapsed
+
+
+def random_opening(seed, plies):
+    board = Board()
+    board.setup_initial()
+    rng = random.Random(seed)
+    moves = []
+    for _ in range(plies):
+        legal = board.legal_moves()
+        if not legal:
+            break
+        move = rng.choice(legal)
+        board.make_move(move)
+        moves.append(move)
+    return moves
+
+
+def play_game(index, white, black, white_config, black_config, opening=(), max_plies=300):
+    start = time.perf_counter()
+    board = Board()
+    board.setup_initial()
+    engines = (Engine(**white_config), Engine(**black_config))
+    moves = list(opening)
+    for move in moves:
+        board.make_move(move)
+
+    nodes = 0
+    result, termination = '1/2-1/2', 'max plies'
+    while len(moves) < max_plies:
+        ended = board.termination()
+        if ended is not None:
+            termination, result = ended
+            break
+        search = engines[board.side_to_move].search(board)
+        nodes += search.nodes
+        board.make_move(search.move)
+        moves.append(search.move)
+
+    board.setup_initial()
+    headers = {'Event': 'Engine tournament', 'Round': str(index + 1), 'White': white, 'Black': black,
+               'Result': result, 'Termination': termination}
+    pgn = format_pgn(headers, moves_to_san(board, moves), result)
+    return GameResult(index, white, black, result, termination, len(moves), pgn, nodes,
+                      time.perf_counter() - start)
+
+
+class Standings:
+    def __init__(self, names):
+        self.points = dict.fromkeys(names, 0.0)
+        self.games = dict.fromkeys(names, 0)
+        self.terminations = {}
+        self.nodes = 0
+        self.elapsed = 0.0
+
+    def add(self, game):
+        self.games[game.white] += 1
+        self.games[game.black] += 1
+        if game.result == '1-0':
+            self.points[game.white] += 1
+        elif game.result == '0-1':
+            self.points[game.black] += 1
+        else:
+            self.points[game.white] += 0.5
+            self.points[game.black] += 0.5
+        self.terminations[game.termination] = self.terminations.get(game.termination, 0) + 1
+        self.nodes += game.nodes
+        self.elapsed += game.elapsed
+
+    def summary(self):
+        table = ', '.join(f"{name} {self.points[name]:g}/{self.games[name]}"
+                          for name in sorted(self.points, key=self.points.get, reverse=True))
+        return f"{table} | {self.terminations} | {self.nodes / max(self.elapsed, 1e-9):,.0f} nodes/s per worker"
+
+
+class Tournament:
+    def __init__(self, engines, rounds=1, workers=None, opening_plies=4, max_plies=300, seed=0):
+        self.engines = engines
+        self.rounds = rounds
+        self.workers = workers or os.cpu_count() or 1
+        self.opening_plies = opening_plies
+        self.max_plies = max_plies
+        self.seed = seed
+        self.standings = Standings(engines)
+
+    def schedule(self):
+        names = sorted(self.engines)
+        index = 0
+        for round_number in range(self.rounds):
+            for i, first in enumerate(names):
+                for second in names[i + 1:]:
+                    opening = random_opening(self.seed + index, self.opening_plies)
+                    for white, black in ((first, second), (second, first)):
+                        yield (index, white, black, self.engines[white], self.engines[black],
+                               opening, self.max_plies)
+                        index += 1
+
+    def run(self):
+        jobs = self.schedule()
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            pending = set()
+            for job in jobs:
+                pending.add(executor.submit(play_game, *job))
+                if len(pending) >= 2 * self.workers:
+                    break
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    game = future.result()
+                    self.standings.add(game)
+                    yield game
+                    job = next(jobs, None)
+                    if job is not None:
+                        pending.add(executor.submit(play_game, *job))
+
+
+def parse_engine(spec):
+    name, _, options = spec.partition(':')
+    config = {}
+    for option in filter(None, options.split(':')):
+        key, _, value = option.partition('=')
+        if key in ('book', 'endgame'):
+            config[key] = value
+        else:
+            config[key] = float(value) if key == 'time_limit' else int(value)
+    return name, config
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run an engine-vs-engine tournament on a process pool.')
+    parser.add_argument('--engine', action='append', default=[],
+                        help='NAME[:time_limit=S][:max_depth=N][:node_limit=N][:book=PATH][:endgame=PATH], '
+                             'at least two')
+    parser.add_argument('--rounds', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--opening-plies', type=int, default=4)
+    parser.add_argument('--max-plies', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--pgn', help='append finished games to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    engines = dict(parse_engine(spec) for spec in args.engine)
+    if len(engines) < 2:
+        parser.error('at least two --engine options are required')
+    tournament = Tournament(engines, args.rounds, args.workers, args.opening_plies, args.max_plies, args.seed)
+    out = open(args.pgn, 'a') if args.pgn else sys.stdout
+    try:
+        for game in tournament.run():
+            out.write(game.pgn + '\n')
+            out.flush()
+            print(f"game {game.index + 1}: {game.white} - {game.black} {game.result} ({game.termination}, "
+                  f"{game.plies} plies) | {tournament.standings.summary()}", file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+import argparse
+import os
+import re
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from chess_board import Board, START_FEN
+from chess_notation import RESULTS, parse_san
+
+HEADER_PATTERN = re.compile(r'^\[(\w+)\s+"(.*)"\]\s*$')
+MOVE_NUMBER_PATTERN = re.compile(r'^\d+\.+')
+
+
+class PgnGame:
+    def __init__(self, index, headers, movetext, line_number):
+        self.index = index
+        self.headers = headers
+        self.movetext = movetext
+        self.line_number = line_number
+
+
+class GameVerdict:
+    def __init__(self, index, headers, valid, plies, final_fen, result, error=None):
+        self.index = index
+        self.headers = headers
+        self.valid = valid
+        self.plies = plies
+        self.final_fen = final_fen
+        self.result = result
+        self.error = error
+
+    def __repr__(self):
+        status = 'ok' if self.valid else f"invalid ({self.error})"
+        return f"GameVerdict(#{self.index + 1} {status}, plies={self.plies}, fen={self.final_fen!r})"
+
+
+def iter_pgn_games(lines):
+    headers = {}
+    movetext = []
+    start_line = None
+    index = 0
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('%'):
+            continue
+        match = HEADER_PATTERN.match(line)
+        if match and movetext:
+            yield PgnGame(index, headers, '\n'.join(movetext), start_line)
+            index += 1
+            headers, movetext = {}, []
+        if not headers and not movetext:
+            start_line = line_number
+        if match:
+            headers[match.group(1)] = match.group(2)
+        else:
+            movetext.append(line)
+    if headers or movetext:
+        yield PgnGame(index, headers, '\n'.join(movetext), start_line)
+
+
+def iter_san_tokens(movetext):
+    depth = 0
+    i = 0
+    length = len(movetext)
+    while i < length:
+        char = movetext[i]
+        if char == '{':
+            end = movetext.find('}', i)
+            i = length if end < 0 else end + 1
+            continue
+        if char == ';':
+            end = movetext.find('\n', i)
+            i = length if end < 0 else end + 1
+            continue
+        if char == '(':
+            depth += 1
+            i += 1
+            continue
+        if char == ')':
+            depth -= 1
+            i += 1
+            continue
+        if char.isspace():
+            i += 1
+            continue
+        end = i
+        while end < length and not movetext[end].isspace() and movetext[end] not in '{;()':
+            end += 1
+        token = movetext[i:end]
+        i = end
+        if depth:
+            continue
+        token = MOVE_NUMBER_PATTERN.sub('', token)
+        if token and not token.startswith('$'):
+            yield token
+
+
+def validate_game(game):
+    board = Board()
+    fen = game.headers.get('FEN', START_FEN)
+    try:
+        board.set_fen(fen)
+    except ValueError as error:
+        return GameVerdict(game.index, game.headers, False, 0, None, None, str(error))
+
+    result = game.headers.get('Result', '*')
+    plies = 0
+    for token in iter_san_tokens(game.movetext):
+        if token in RESULTS:
+            result = token
+            break
+        try:
+            board.make_move(parse_san(board, token))
+        except ValueError as error:
+            return GameVerdict(game.index, game.headers, False, plies, board.fen(), result,
+                               f"ply {plies + 1}: {error}")
+        plies += 1
+    return GameVerdict(game.index, game.headers, True, plies, board.fen(), result)
+
+
+def _validate_chunk(games):
+    return [validate_game(game) for game in games]
+
+
+def iter_chunks(games, chunk_size):
+    chunk = []
+    for game in games:
+        chunk.append(game)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def validate_pgn(lines, workers=1, chunk_size=64):
+    games = iter_pgn_games(lines)
+    if workers <= 1:
+        for game in games:
+            yield validate_game(game)
+        return
+
+    chunks = iter_chunks(games, chunk_size)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(_validate_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            for verdict in pending.popleft().result():
+                yield verdict
+            chunk = next(chunks, None)
+            if chunk is not None:
+                pending.append(executor.submit(_validate_chunk, chunk))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Validate every move of every game in a PGN file.')
+    parser.add_argument('path', help='PGN file, or - for stdin')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-size', type=int, default=64)
+    parser.add_argument('--quiet', action='store_true', help='only report invalid games and the summary')
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.path == '-' else open(args.path, encoding='utf-8', errors='replace')
+    total = invalid = 0
+    try:
+        for verdict in validate_pgn(source, args.workers, args.chunk_size):
+            total += 1
+            if not verdict.valid:
+                invalid += 1
+            if not verdict.valid or not args.quiet:
+                status = 'ok' if verdict.valid else f"invalid\t{verdict.error}"
+                print(f"{verdict.index + 1}\t{verdict.plies}\t{verdict.result}\t{verdict.final_fen}\t{status}")
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    print(f"{total} games, {total - invalid} valid, {invalid} invalid", file=sys.stderr)
+    return 1 if invalid else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
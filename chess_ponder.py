@@ -0,0 +1,84 @@
+import threading
+
+from chess_board import Board
+from chess_metrics import log, metrics
+
+
+class PonderingEngine:
+    # The worker only touches its own Board copy and the cache; the lock guards the cache alone,
+    # so UI handlers never wait on a search or on a vpython call.
+    def __init__(self, engine, max_replies=None):
+        self.engine = engine
+        self.max_replies = max_replies
+        self.cache = {}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.predicted = 0
+        self.hits = 0
+        self.misses = 0
+
+    def choose_move(self, board):
+        return self.search(board).move
+
+    def search(self, board):
+        self.stop()
+        with self.lock:
+            result = self.cache.get(board.hash)
+            self.cache = {}
+        if result is not None and result.move in board.legal_moves():
+            self.hits += 1
+            if metrics.enabled:
+                metrics.count('ponder_hit')
+        else:
+            self.misses += 1
+            if metrics.enabled:
+                metrics.count('ponder_miss')
+            result = self.engine.search(board)
+        self.predicted = result.pv[1] if len(result.pv) > 1 else 0
+        return result
+
+    def ponder(self, board):
+        self.stop()
+        replies = board.legal_moves()
+        if not replies:
+            return
+        if self.predicted in replies:
+            replies.remove(self.predicted)
+            replies.insert(0, self.predicted)
+        if self.max_replies is not None:
+            replies = replies[:self.max_replies]
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._ponder, name='ponder', daemon=True,
+                                       args=(board.fen(), dict(board.repetitions), replies, self.stop_event))
+        self.thread.start()
+
+    def stop(self):
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+
+    def is_pondering(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def _ponder(self, fen, repetitions, replies, stop_event):
+        board = Board()
+        board.set_fen(fen)
+        board.repetitions = repetitions
+        self.engine.stop = stop_event
+        try:
+            for reply in replies:
+                if stop_event.is_set():
+                    break
+                board.make_move(reply)
+                if board.has_legal_move():
+                    result = self.engine.search(board)
+                    if not stop_event.is_set():
+                        with self.lock:
+                            self.cache[board.hash] = result
+                board.unmake_move()
+        except Exception:
+            log.exception("Pondering failed")
+        finally:
+            self.engine.stop = None
@@ -0,0 +1,173 @@
+import threading
+import time
+
+from chess_metrics import metrics
+
+
+class RenderScheduler:
+    def __init__(self, fps=30):
+        self.fps = fps
+        self.dirty = {}
+        self.frames = 0
+        self.wake = threading.Event()
+        self.lock = threading.Lock()
+
+    def mark_dirty(self, name, callback):
+        with self.lock:
+            if metrics.enabled and name in self.dirty:
+                metrics.count('render_coalesced')
+            self.dirty[name] = callback
+        self.wake.set()
+
+    def is_idle(self):
+        return not self.dirty
+
+    def wait(self, timeout):
+        if self.wake.wait(timeout):
+            self.wake.clear()
+
+    def flush(self):
+        with self.lock:
+            if not self.dirty:
+                return False
+            callbacks = list(self.dirty.values())
+            self.dirty = {}
+            self.wake.clear()
+        for callback in callbacks:
+            callback()
+        self.frames += 1
+        if metrics.enabled:
+            metrics.count('render_frames')
+        return True
+
+
+SHAPES = ('box', 'sphere', 'cylinder', 'cone', 'pyramid', 'ring')
+
+
+class Vector:
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        self.x = x
+        self.y = y
+        self.z = z
+
+    def __add__(self, other):
+        return Vector(self.x + other.x, self.y + other.y, self.z + other.z)
+
+    def __sub__(self, other):
+        return Vector(self.x - other.x, self.y - other.y, self.z - other.z)
+
+    def __mul__(self, factor):
+        return Vector(self.x * factor, self.y * factor, self.z * factor)
+
+    __rmul__ = __mul__
+
+    def __eq__(self, other):
+        return isinstance(other, Vector) and (self.x, self.y, self.z) == (other.x, other.y, other.z)
+
+    def __repr__(self):
+        return f"<{self.x}, {self.y}, {self.z}>"
+
+
+class SceneObject:
+    def __init__(self, kind, attrs):
+        self.kind = kind
+        self.visible = True
+        self.handlers = {}
+        self.__dict__.update(attrs)
+
+    def bind(self, event, handler):
+        self.handlers[event] = handler
+
+    def delete(self):
+        self.visible = False
+
+
+class NullRenderer:
+    def vector(self, x, y, z):
+        return Vector(x, y, z)
+
+    def make_object(self, kind, attrs):
+        return SceneObject(kind, attrs)
+
+    def create(self, shape, **attrs):
+        if shape not in SHAPES:
+            raise ValueError(f"Unknown shape: {shape}")
+        return self.make_object(shape, attrs)
+
+    def canvas(self, **attrs):
+        scene = self.make_object('canvas', attrs)
+        scene.camera = self.make_object('camera', {})
+        scene.title_anchor = None
+        return scene
+
+    def button(self, **attrs):
+        return self.make_object('button', attrs)
+
+    def wtext(self, **attrs):
+        return self.make_object('wtext', attrs)
+
+    def rate(self, fps):
+        time.sleep(1.0 / fps)
+
+
+class RecordedObject(SceneObject):
+    def __init__(self, recorder, kind, attrs):
+        self.__dict__['recorder'] = None
+        SceneObject.__init__(self, kind, attrs)
+        self.__dict__['recorder'] = recorder
+
+    def __setattr__(self, name, value):
+        if self.recorder is not None:
+            self.recorder.calls.append(('set', self.kind, name, value))
+        self.__dict__[name] = value
+
+
+class RecordingRenderer(NullRenderer):
+    def __init__(self):
+        self.calls = []
+
+    def make_object(self, kind, attrs):
+        self.calls.append(('create', kind, attrs))
+        return RecordedObject(self, kind, attrs)
+
+    def rate(self, fps):
+        self.calls.append(('rate', fps))
+
+    def count(self, op, kind=None):
+        return sum(1 for call in self.calls if call[0] == op and (kind is None or call[1] == kind))
+
+    def clear(self):
+        del self.calls[:]
+
+
+class VPythonRenderer:
+    def __init__(self):
+        import vpython
+        self.vp = vpython
+
+    def vector(self, x, y, z):
+        return self.vp.vector(x, y, z)
+
+    def create(self, shape, **attrs):
+        if shape not in SHAPES:
+            raise ValueError(f"Unknown shape: {shape}")
+        if 'color' in attrs:
+            attrs['color'] = self.vp.vector(*attrs['color'])
+        return getattr(self.vp, shape)(**attrs)
+
+    def canvas(self, **attrs):
+        if 'background' in attrs:
+            attrs['background'] = self.vp.vector(*attrs['background'])
+        return self.vp.canvas(**attrs)
+
+    def button(self, **attrs):
+        return self.vp.button(**attrs)
+
+    def wtext(self, **attrs):
+        return self.vp.wtext(**attrs)
+
+    def rate(self, fps):
+        self.vp.rate(fps)
+
+
+RENDERERS = {'vpython': VPythonRenderer, 'null': NullRenderer, 'recording': RecordingRenderer}
@@ -0,0 +1,320 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from chess_board import (Board, START_FEN, WHITE, BLACK, PAWN, PIECE_LETTERS, PROMOTION_KINDS, PROMOTION_RANKS,
+                         encode_move, parse_square, square_name)
+from chess_metrics import log, metrics
+from chess_notation import move_to_san, move_to_uci, parse_uci
+from chess_parallel import _search_worker
+
+SIDES = {'white': WHITE, 'black': BLACK}
+
+
+def game_status(board):
+    ended = board.termination()
+    if ended is not None:
+        return ended
+    return ('check' if board.is_in_check(board.side_to_move) else 'ongoing'), '*'
+
+
+def is_legal_move(board, move):
+    start, end = move & 63, (move >> 6) & 63
+    code = board.squares[start]
+    if not code or code >> 3 != board.side_to_move or not board.is_valid_move(start, end):
+        return False
+    if code & 7 == PAWN and PROMOTION_RANKS >> end & 1:
+        if move >> 12 not in PROMOTION_KINDS:
+            return False
+    elif move >> 12:
+        return False
+    return board.is_legal(move)
+
+
+class Session:
+    def __init__(self, game_id, engine_side=None):
+        self.game_id = game_id
+        self.engine_side = engine_side
+        self.board = Board()
+        self.board.setup_initial()
+        self.selected = None
+        self.thinking = False
+        self.pending = None
+        self.writer = None
+        self.status = game_status(self.board)
+
+    def state(self):
+        self.status = status, result = game_status(self.board)
+        return {'game': self.game_id, 'fen': self.board.fen(),
+                'turn': 'white' if self.board.side_to_move == WHITE else 'black',
+                'ply': len(self.board.history), 'status': status, 'result': result}
+
+    def engine_to_move(self):
+        return self.engine_side == self.board.side_to_move and self.status[1] == '*'
+
+
+class ChessServer:
+    def __init__(self, workers=None, time_limit=0.5, node_limit=None, max_depth=None, **config):
+        self.workers = workers or os.cpu_count() or 1
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.max_depth = max_depth
+        self.config = config
+        self.executor = None
+        self.sessions = {}
+        self.game_ids = itertools.count(1)
+        self.commands = {
+            'new': self.cmd_new,
+            'fen': self.cmd_fen,
+            'state': self.cmd_state,
+            'select': self.cmd_select,
+            'move': self.cmd_move,
+            'undo': self.cmd_undo,
+            'redo': self.cmd_redo,
+            'go': self.cmd_go,
+            'close': self.cmd_close,
+        }
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def session(self, request, owner=None):
+        session = self.sessions.get(request.get('game'))
+        if session is None or (owner is not None and session.game_id not in owner):
+            raise ValueError(f"Unknown game: {request.get('game')}")
+        return session
+
+    def handle(self, request, owner=None):
+        command = self.commands.get(request.get('cmd'))
+        if command is None:
+            raise ValueError(f"Unknown command: {request.get('cmd')}")
+        return command(request, owner)
+
+    def cmd_new(self, request, owner):
+        engine_side = request.get('engine')
+        if engine_side is not None and engine_side not in SIDES:
+            raise ValueError(f"Invalid engine side: {engine_side}")
+        session = Session(next(self.game_ids), SIDES.get(engine_side))
+        if request.get('fen'):
+            session.board.set_fen(request['fen'])
+        self.sessions[session.game_id] = session
+        if owner is not None:
+            owner.add(session.game_id)
+        reply = session.state()
+        self.schedule_engine(session)
+        return reply
+
+    def cmd_fen(self, request, owner):
+        session = self.idle_session(request, owner)
+        session.board.set_fen(request.get('fen') or START_FEN)
+        session.selected = None
+        reply = session.state()
+        self.schedule_engine(session)
+        return reply
+
+    def cmd_state(self, request, owner):
+        return self.session(request, owner).state()
+
+    def cmd_select(self, request, owner):
+        session = self.session(request, owner)
+        start = parse_square(request['square'])
+        code = session.board.squares[start]
+        if not code or code >> 3 != session.board.side_to_move:
+            raise ValueError(f"No piece of the side to move on {request['square']}")
+        session.selected = start
+        return {'game': session.game_id, 'square': request['square'],
+                'targets': list(dict.fromkeys(square_name((move >> 6) & 63)
+                                              for move in session.board.legal_moves_from(start)))}
+
+    def cmd_move(self, request, owner):
+        session = self.idle_session(request, owner)
+        board = session.board
+        if 'move' in request:
+            move = parse_uci(request['move'])
+        elif session.selected is not None and 'to' in request:
+            end = parse_square(request['to'])
+            promotion = 0
+            if board.squares[session.selected] & 7 == PAWN and PROMOTION_RANKS >> end & 1:
+                letter = request.get('promotion', 'q')
+                if letter not in ('n', 'b', 'r', 'q'):
+                    raise ValueError(f"Invalid promotion: {letter}")
+                promotion = PIECE_LETTERS.index(letter)
+            move = encode_move(session.selected, end, promotion)
+        else:
+            raise ValueError('move needs "move" or a selection and "to"')
+        if session.status[1] != '*':
+            raise ValueError('Game is over')
+        if not is_legal_move(board, move):
+            raise ValueError(f"Illegal move: {move_to_uci(move)}")
+        san = move_to_san(board, move, check=False)
+        board.make_move(move)
+        board.history.clear_redo()
+        session.selected = None
+        reply = session.state()
+        if reply['status'] == 'checkmate':
+            san += '#'
+        elif board.is_in_check(board.side_to_move):
+            san += '+'
+        reply['san'] = san
+        self.schedule_engine(session)
+        return reply
+
+    def cmd_undo(self, request, owner):
+        session = self.idle_session(request, owner)
+        if not len(session.board.history):
+            raise ValueError('Nothing to undo')
+        session.board.history.push_redo(session.board.unmake_move())
+        session.selected = None
+        reply = session.state()
+        self.schedule_engine(session)
+        return reply
+
+    def cmd_redo(self, request, owner):
+        session = self.idle_session(request, owner)
+        move = session.board.history.pop_redo()
+        if move is None:
+            raise ValueError('Nothing to redo')
+        session.board.make_move(move)
+        session.selected = None
+        reply = session.state()
+        self.schedule_engine(session)
+        return reply
+
+    def cmd_go(self, request, owner):
+        session = self.idle_session(request, owner)
+        if session.status[1] != '*':
+            raise ValueError('Game is over')
+        self.schedule_engine(session, force=True)
+        return {'game': session.game_id, 'thinking': True}
+
+    def cmd_close(self, request, owner):
+        session = self.session(request, owner)
+        del self.sessions[session.game_id]
+        if owner is not None:
+            owner.discard(session.game_id)
+        return {'game': session.game_id, 'closed': True}
+
+    def idle_session(self, request, owner):
+        session = self.session(request, owner)
+        if session.thinking:
+            raise ValueError('Engine is thinking')
+        return session
+
+    def schedule_engine(self, session, force=False):
+        if session.thinking or not (force or session.engine_to_move()):
+            return
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        session.thinking = True
+        board = session.board
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, _search_worker, board.fen(), dict(board.repetitions), None,
+                                      self.config, self.time_limit, self.node_limit, self.max_depth)
+        session.pending = future
+        future.add_done_callback(lambda done: self.engine_done(session, done))
+
+    def engine_done(self, session, future):
+        session.thinking = False
+        session.pending = None
+        if future.cancelled() or self.sessions.get(session.game_id) is not session:
+            return
+        try:
+            move, score, depth, nodes, pv, _ = future.result()
+        except Exception as error:
+            log.warning("Engine search failed for game %s: %s", session.game_id, error)
+            self.push(session, {'event': 'error', 'game': session.game_id, 'error': str(error)})
+            return
+        san = move_to_san(session.board, move)
+        session.board.make_move(move)
+        session.board.history.clear_redo()
+        event = session.state()
+        event.update(event='engine_move', move=move_to_uci(move), san=san, score=score, depth=depth, nodes=nodes)
+        self.push(session, event)
+
+    def push(self, session, message):
+        writer = session.writer
+        if writer is not None and not writer.is_closing():
+            writer.write(json.dumps(message).encode() + b'\n')
+
+    async def serve_client(self, reader, writer):
+        owned = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                start = time.perf_counter()
+                request = None
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError('request must be a JSON object')
+                    reply = self.handle(request, owned)
+                    reply['ok'] = True
+                    game = self.sessions.get(reply.get('game'))
+                    if game is not None:
+                        game.writer = writer
+                except (ValueError, KeyError, TypeError) as error:
+                    request = request if isinstance(request, dict) else {}
+                    reply = {'ok': False, 'error': str(error)}
+                if 'id' in request:
+                    reply['id'] = request['id']
+                writer.write(json.dumps(reply).encode() + b'\n')
+                if metrics.enabled:
+                    metrics.count('server_commands')
+                    metrics.add_time('server_command', time.perf_counter() - start)
+                if writer.transport.get_write_buffer_size() > 65536:
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for game_id in owned:
+                session = self.sessions.pop(game_id, None)
+                if session is not None and session.pending is not None:
+                    session.pending.cancel()
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=7878, unix_path=None):
+        if unix_path:
+            server = await asyncio.start_unix_server(self.serve_client, path=unix_path)
+        else:
+            server = await asyncio.start_server(self.serve_client, host, port)
+        log.info("Serving on %s", unix_path or f"{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve many chess games over a JSON line protocol.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7878)
+    parser.add_argument('--unix', metavar='PATH', help='listen on a Unix socket instead of TCP')
+    parser.add_argument('--workers', type=int, default=None, help='engine worker processes')
+    parser.add_argument('--think-time', type=float, default=0.5, help='engine time budget per move in seconds')
+    parser.add_argument('--max-depth', type=int, default=None)
+    parser.add_argument('--book', help='opening book built with chess_book.py')
+    parser.add_argument('--endgame', help='endgame table built with chess_book.py')
+    args = parser.parse_args(argv)
+
+    config = {key: value for key, value in (('book', args.book), ('endgame', args.endgame)) if value}
+    server = ChessServer(args.workers, args.think_time, max_depth=args.max_depth, **config)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+ALWAYS_REPLACE = 'always'
+DEPTH_PREFERRED = 'depth'
+TWO_TIER = 'two-tier'
+POLICIES = (ALWAYS_REPLACE, DEPTH_PREFERRED, TWO_TIER)
+
+# Measured per-slot cost, including the key and the value objects: search entries are
+# (depth, score, flag, move) tuples, move-cache entries an array('H') of legal moves and the check flag.
+ENTRY_BYTES = 208
+MOVE_LIST_ENTRY_BYTES = 320
+
+
+class TranspositionTable:
+    def __init__(self, size_bytes=16 * 1024 * 1024, policy=DEPTH_PREFERRED, entry_bytes=ENTRY_BYTES):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown replacement policy: {policy}")
+        self.policy = policy
+        self.size = max(2, size_bytes // entry_bytes) & ~1
+        self.generation = 0
+        self.clear()
+
+    def clear(self):
+        self.keys = [None] * self.size
+        self.depths = [0] * self.size
+        self.generations = [0] * self.size
+        self.values = [None] * self.size
+        self.hits = 0
+        self.misses = 0
+
+    def new_search(self):
+        self.generation = (self.generation + 1) & 0xFF
+
+    def _slot(self, key):
+        if self.policy == TWO_TIER:
+            return (key % (self.size >> 1)) << 1
+        return key % self.size
+
+    def probe(self, key):
+        slot = self._slot(key)
+        if self.keys[slot] == key:
+            self.hits += 1
+            return self.values[slot]
+        if self.policy == TWO_TIER and self.keys[slot + 1] == key:
+            self.hits += 1
+            return self.values[slot + 1]
+        self.misses += 1
+        return None
+
+    def store(self, key, value, depth=0):
+        slot = self._slot(key)
+        if self.policy == ALWAYS_REPLACE:
+            self._write(slot, key, value, depth)
+        elif self.policy == DEPTH_PREFERRED:
+            if self._replaceable(slot, key, depth):
+                self._write(slot, key, value, depth)
+        elif self.keys[slot + 1] == key:
+            self._write(slot + 1, key, value, depth)
+        elif self._replaceable(slot, key, depth):
+            if self.keys[slot] is not None and self.keys[slot] != key:
+                self.keys[slot + 1] = self.keys[slot]
+                self.depths[slot + 1] = self.depths[slot]
+                self.generations[slot + 1] = self.generations[slot]
+                self.values[slot + 1] = self.values[slot]
+            self._write(slot, key, value, depth)
+        else:
+            self._write(slot + 1, key, value, depth)
+
+    def _replaceable(self, slot, key, depth):
+        return (self.keys[slot] is None or self.keys[slot] == key
+                or self.generations[slot] != self.generation or depth >= self.depths[slot])
+
+    def _write(self, slot, key, value, depth):
+        self.keys[slot] = key
+        self.depths[slot] = depth
+        self.generations[slot] = self.generation
+        self.values[slot] = value
+
+    def usage(self):
+        return sum(1 for key in self.keys if key is not None) / self.size
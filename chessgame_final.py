@@ -1,67 +1,119 @@
-from vpython import *
+from chess_board import (Board, START_FEN, WHITE, BLACK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, PROMOTION_RANKS,
+                         encode_move, iter_bits, move_end, move_promotion, move_start, piece_color, piece_kind,
+                         square, square_xy)
+from chess_metrics import log, metrics
+from chess_render import RENDERERS, RenderScheduler
+from chess_tt import MOVE_LIST_ENTRY_BYTES, TranspositionTable
 
 class ChessPiece:
-    def __init__(self, position, color):
+    __slots__ = ('position', 'color', 'code', 'visible', 'renderer', 'graphics')
+
+    def __init__(self, position, color, code=0):
         self.position = position
         self.color = color
+        self.code = code
+        self.visible = True
+        self.renderer = None
         self.graphics = []
 
-    def draw(self):
-        pass
+    def draw(self, renderer):
+        self.renderer = renderer
+
+    def set_visible(self, visible):
+        if visible == self.visible:
+            return
+        self.visible = visible
+        for part in self.graphics:
+            part.visible = visible
+
+    def move_to(self, position):
+        if position == self.position:
+            return
+        self.position = position
+        for part in self.graphics:
+            part.pos = self.renderer.vector(position.x, position.y, part.pos.z)
 
 class Pawn(ChessPiece):
-    def draw(self):
+    __slots__ = ()
+
+    def draw(self, renderer):
+        self.renderer = renderer
+        vector, create = renderer.vector, renderer.create
         self.graphics = [
-            sphere(pos=self.position + vector(0, 0, 0.6), radius=0.3, color=self.color),
-            cylinder(pos=self.position, axis=vector(0, 0, 0.5), radius=0.3, color=self.color),
-            cylinder(pos=self.position + vector(0, 0, 0.5), axis=vector(0, 0, 0.1), radius=0.15, color=self.color)
+            create('sphere', pos=self.position + vector(0, 0, 0.6), radius=0.3, color=self.color),
+            create('cylinder', pos=self.position, axis=vector(0, 0, 0.5), radius=0.3, color=self.color),
+            create('cylinder', pos=self.position + vector(0, 0, 0.5), axis=vector(0, 0, 0.1), radius=0.15, color=self.color)
         ]
 
 class Rook(ChessPiece):
-    def draw(self):
+    __slots__ = ()
+
+    def draw(self, renderer):
+        self.renderer = renderer
+        vector, create = renderer.vector, renderer.create
         self.graphics = [
-            box(pos=self.position + vector(0, 0, 0.5), size=vector(0.6, 0.6, 1), color=self.color),
-            cylinder(pos=self.position, axis=vector(0, 0, 0.5), radius=0.3, color=self.color)
+            create('box', pos=self.position + vector(0, 0, 0.5), size=vector(0.6, 0.6, 1), color=self.color),
+            create('cylinder', pos=self.position, axis=vector(0, 0, 0.5), radius=0.3, color=self.color)
         ]
 
 class Knight(ChessPiece):
-    def draw(self):
+    __slots__ = ()
+
+    def draw(self, renderer):
+        self.renderer = renderer
+        vector, create = renderer.vector, renderer.create
         self.graphics = [
-            sphere(pos=self.position + vector(0, 0, 0.8), radius=0.4, color=self.color),
-            box(pos=self.position + vector(0, 0, 0.4), size=vector(0.6, 0.3, 0.8), color=self.color),
-            cylinder(pos=self.position, axis=vector(0, 0, 0.4), radius=0.3, color=self.color)
+            create('sphere', pos=self.position + vector(0, 0, 0.8), radius=0.4, color=self.color),
+            create('box', pos=self.position + vector(0, 0, 0.4), size=vector(0.6, 0.3, 0.8), color=self.color),
+            create('cylinder', pos=self.position, axis=vector(0, 0, 0.4), radius=0.3, color=self.color)
         ]
 
-    def is_valid_move(self, start, end, pieces):
-        dx = abs(end[0] - start[0])
-        dy = abs(end[1] - start[1])
-        return (dx == 2 and dy == 1) or (dx == 1 and dy == 2)
-
 class Bishop(ChessPiece):
-    def draw(self):
+    __slots__ = ()
+
+    def draw(self, renderer):
+        self.renderer = renderer
+        vector, create = renderer.vector, renderer.create
         self.graphics = [
-            cone(pos=self.position + vector(0, 0, 0.5), axis=vector(0, 0, 1), radius=0.3, color=self.color),
-            cylinder(pos=self.position, axis=vector(0, 0, 0.5), radius=0.3, color=self.color)
+            create('cone', pos=self.position + vector(0, 0, 0.5), axis=vector(0, 0, 1), radius=0.3, color=self.color),
+            create('cylinder', pos=self.position, axis=vector(0, 0, 0.5), radius=0.3, color=self.color)
         ]
 
 class Queen(ChessPiece):
-    def draw(self):
+    __slots__ = ()
+
+    def draw(self, renderer):
+        self.renderer = renderer
+        vector, create = renderer.vector, renderer.create
         self.graphics = [
-            pyramid(pos=self.position + vector(0, 0, 1), size=vector(0.8, 0.8, 1.2), color=self.color),
-            cylinder(pos=self.position, axis=vector(0, 0, 0.8), radius=0.4, color=self.color),
-            ring(pos=self.position + vector(0, 0, 1.4), axis=vector(0, 0, 1), radius=0.5, thickness=0.1, color=self.color)
+            create('pyramid', pos=self.position + vector(0, 0, 1), size=vector(0.8, 0.8, 1.2), color=self.color),
+            create('cylinder', pos=self.position, axis=vector(0, 0, 0.8), radius=0.4, color=self.color),
+            create('ring', pos=self.position + vector(0, 0, 1.4), axis=vector(0, 0, 1), radius=0.5, thickness=0.1, color=self.color)
         ]
 
 class King(ChessPiece):
-    def draw(self):
+    __slots__ = ()
+
+    def draw(self, renderer):
+        self.renderer = renderer
+        vector, create = renderer.vector, renderer.create
         self.graphics = [
-            pyramid(pos=self.position + vector(0, 0, 1.2), size=vector(0.8, 0.8, 1.5), color=self.color),
-            cylinder(pos=self.position, axis=vector(0, 0, 0.8), radius=0.4, color=self.color),
-            sphere(pos=self.position + vector(0, 0, 2.1), radius=0.2, color=self.color)
+            create('pyramid', pos=self.position + vector(0, 0, 1.2), size=vector(0.8, 0.8, 1.5), color=self.color),
+            create('cylinder', pos=self.position, axis=vector(0, 0, 0.8), radius=0.4, color=self.color),
+            create('sphere', pos=self.position + vector(0, 0, 2.1), radius=0.2, color=self.color)
         ]
 
+PIECE_CLASSES = {PAWN: Pawn, KNIGHT: Knight, BISHOP: Bishop, ROOK: Rook, QUEEN: Queen, KING: King}
+WHITE_RGB = (1, 1, 1)
+BLACK_RGB = (0, 0, 0)
+PIECE_COLORS = {WHITE: WHITE_RGB, BLACK: BLACK_RGB}
+TURN_NAMES = ('white', 'black')
+
 class ChessGame:
-    def __init__(self):
+    def __init__(self, white_player=None, black_player=None, renderer=None):
+        self.players = (white_player, black_player)
+        self.renderer = renderer if renderer is not None else RENDERERS['vpython']()
+        vector = self.renderer.vector
         self.camera_pos = vector(0, -10, 10)
         self.camera_target = vector(0, 0, 0)
         self.camera_up = vector(0, 0, 1)
@@ -69,25 +121,38 @@ class ChessGame:
         self.rotation_speed = 0.5
         self.selected_piece = None
         self.selected_piece_pos = None
-        self.highlight_ring = None
         self.highlight_tiles = []
+        self.shown_tiles = set()
         self.dragging = False
         self.last_mouse_pos = vector(0, 0, 0)
-        self.current_turn = 'white'
         self.menu_open = False
         self.game_over = False
+        self.closed = False
+        self.render = RenderScheduler()
+        self.dirty_pieces = {}
 
         self.board_size = 8
         self.tile_size = 1
         self.pieces = {}
+        self.piece_pool = {}
+        self.board = Board(TranspositionTable(1024 * 1024, entry_bytes=MOVE_LIST_ENTRY_BYTES))
 
-        self.move_history = []
+        self.captured_pieces = []
 
-        self.scene = canvas(title='Chess Game', width=800, height=800, center=vector(0, 0, 0), background=color.gray(0.5))
+        self.scene = self.renderer.canvas(title='Chess Game', width=800, height=800, center=vector(0, 0, 0),
+                                          background=(0.5, 0.5, 0.5))
 
         self.draw_chessboard()
+        self.highlight_pool = [self.renderer.create('box', pos=self.square_center(square_xy(sq), 0.05),
+                                                    size=vector(self.tile_size, self.tile_size, 0.1),
+                                                    color=(0, 0, 1), opacity=0.5, visible=False)
+                               for sq in range(self.board_size * self.board_size)]
+        self.highlight_ring = self.renderer.create('ring', pos=vector(0, 0, 0), axis=vector(0, 0, 1), radius=0.5,
+                                                   thickness=0.1, color=(1, 1, 0), visible=False)
+        self.board.setup_initial()
         self.draw_pieces()
         self.update_camera()
+        self.render.flush()
 
         self.scene.bind('keydown', self.handle_key_event)
         self.scene.bind('mousedown', self.handle_mouse_down)
@@ -95,53 +160,58 @@ class ChessGame:
         self.scene.bind('mousemove', self.handle_mouse_move)
         self.scene.bind('click', self.handle_mouse_click)
 
-        self.button_new_game = button(bind=self.restart_game, text='New Game', pos=self.scene.title_anchor)
-        self.undo_button = button(bind=self.undo_last_move, text='Undo', pos=self.scene.title_anchor)
-        self.instruction_button = button(bind=self.show_instruction, text='Instruction', pos=self.scene.title_anchor)
-        self.authors_button = button(bind=self.show_authors, text='Authors', pos=self.scene.title_anchor)
-        self.back_button = button(bind=self.hide_instruction, text='Back', pos=self.scene.title_anchor)
-        self.exit_button = button(bind=self.exit_game, text='Exit', pos=self.scene.title_anchor)
-        self.message_text = wtext(text='', pos=self.scene.title_anchor)
+        self.button_new_game = self.renderer.button(bind=self.restart_game, text='New Game', pos=self.scene.title_anchor)
+        self.undo_button = self.renderer.button(bind=self.undo_last_move, text='Undo', pos=self.scene.title_anchor)
+        self.redo_button = self.renderer.button(bind=self.redo_move, text='Redo', pos=self.scene.title_anchor)
+        self.instruction_button = self.renderer.button(bind=self.show_instruction, text='Instruction', pos=self.scene.title_anchor)
+        self.authors_button = self.renderer.button(bind=self.show_authors, text='Authors', pos=self.scene.title_anchor)
+        self.back_button = self.renderer.button(bind=self.hide_instruction, text='Back', pos=self.scene.title_anchor)
+        self.exit_button = self.renderer.button(bind=self.exit_game, text='Exit', pos=self.scene.title_anchor)
+        self.message_text = self.renderer.wtext(text='', pos=self.scene.title_anchor)
 
     def draw_chessboard(self):
         for i in range(self.board_size):
             for j in range(self.board_size):
-                tile_color = color.white if (i + j) % 2 == 0 else color.black
-                box(pos=vector(i - self.board_size / 2 + 0.5, j - self.board_size / 2 + 0.5, 0),
-                    size=vector(self.tile_size, self.tile_size, 0.1),
-                    color=tile_color)
-
-    def draw_pieces(self):
-        self.pieces = {}
-        for i in range(8):
-            self.pieces[(i, 1)] = Pawn(vector(i - self.board_size / 2 + 0.5, 1 - self.board_size / 2 + 0.5, 0.1), color.white)
-            self.pieces[(i, 6)] = Pawn(vector(i - self.board_size / 2 + 0.5, 6 - self.board_size / 2 + 0.5, 0.1), color.black)
+                tile_color = WHITE_RGB if (i + j) % 2 == 0 else BLACK_RGB
+                self.renderer.create('box', pos=self.square_center((i, j)),
+                                     size=self.renderer.vector(self.tile_size, self.tile_size, 0.1),
+                                     color=tile_color)
 
-        self.pieces[(0, 0)] = Rook(vector(0 - self.board_size / 2 + 0.5, 0 - self.board_size / 2 + 0.5, 0.1), color.white)
-        self.pieces[(7, 0)] = Rook(vector(7 - self.board_size / 2 + 0.5, 0 - self.board_size / 2 + 0.5, 0.1), color.white)
-        self.pieces[(0, 7)] = Rook(vector(0 - self.board_size / 2 + 0.5, 7 - self.board_size / 2 + 0.5, 0.1), color.black)
-        self.pieces[(7, 7)] = Rook(vector(7 - self.board_size / 2 + 0.5, 7 - self.board_size / 2 + 0.5, 0.1), color.black)
+    def square_center(self, pos, z=0.0):
+        return self.renderer.vector(pos[0] - self.board_size / 2 + 0.5, pos[1] - self.board_size / 2 + 0.5, z)
 
-        self.pieces[(1, 0)] = Knight(vector(1 - self.board_size / 2 + 0.5, 0 - self.board_size / 2 + 0.5, 0.1), color.white)
-        self.pieces[(6, 0)] = Knight(vector(6 - self.board_size / 2 + 0.5, 0 - self.board_size / 2 + 0.5, 0.1), color.white)
-        self.pieces[(1, 7)] = Knight(vector(1 - self.board_size / 2 + 0.5, 7 - self.board_size / 2 + 0.5, 0.1), color.black)
-        self.pieces[(6, 7)] = Knight(vector(6 - self.board_size / 2 + 0.5, 7 - self.board_size / 2 + 0.5, 0.1), color.black)
+    @property
+    def current_turn(self):
+        return TURN_NAMES[self.board.side_to_move]
 
-        self.pieces[(2, 0)] = Bishop(vector(2 - self.board_size / 2 + 0.5, 0 - self.board_size / 2 + 0.5, 0.1), color.white)
-        self.pieces[(5, 0)] = Bishop(vector(5 - self.board_size / 2 + 0.5, 0 - self.board_size / 2 + 0.5, 0.1), color.white)
-        self.pieces[(2, 7)] = Bishop(vector(2 - self.board_size / 2 + 0.5, 7 - self.board_size / 2 + 0.5, 0.1), color.black)
-        self.pieces[(5, 7)] = Bishop(vector(5 - self.board_size / 2 + 0.5, 7 - self.board_size / 2 + 0.5, 0.1), color.black)
+    @property
+    def move_history(self):
+        return self.board.history
 
-        self.pieces[(3, 0)] = Queen(vector(3 - self.board_size / 2 + 0.5, 0 - self.board_size / 2 + 0.5, 0.1), color.white)
-        self.pieces[(3, 7)] = Queen(vector(3 - self.board_size / 2 + 0.5, 7 - self.board_size / 2 + 0.5, 0.1), color.black)
-
-        self.pieces[(4, 0)] = King(vector(4 - self.board_size / 2 + 0.5, 0 - self.board_size / 2 + 0.5, 0.1), color.white)
-        self.pieces[(4, 7)] = King(vector(4 - self.board_size / 2 + 0.5, 7 - self.board_size / 2 + 0.5, 0.1), color.black)
+    def draw_pieces(self):
+        self.pieces = {}
+        for x in range(self.board_size):
+            for y in range(self.board_size):
+                if self.board.piece_at(square(x, y)):
+                    self.add_piece_graphics((x, y))
+
+    def add_piece_graphics(self, pos):
+        code = self.board.piece_at(square(*pos))
+        parked = self.piece_pool.get(code)
+        if parked:
+            self.place_piece(parked.pop(), pos)
+            return
+        piece_class = PIECE_CLASSES[piece_kind(code)]
+        piece = piece_class(self.square_center(pos, 0.1), PIECE_COLORS[piece_color(code)], code)
+        piece.draw(self.renderer)
+        self.pieces[pos] = piece
 
-        for piece in self.pieces.values():
-            piece.draw()
+    def park_piece(self, piece):
+        self.hide_piece(piece)
+        self.piece_pool.setdefault(piece.code, []).append(piece)
 
     def handle_key_event(self, evt):
+        vector = self.renderer.vector
         key = evt.key
         if key == 'w':
             self.camera_pos += vector(0, 0, -self.camera_speed)
@@ -166,242 +236,230 @@ class ChessGame:
         self.update_camera()
 
     def update_camera(self):
-        self.scene.camera.pos = self.camera_pos
-        self.scene.camera.axis = self.camera_target - self.camera_pos
-        self.scene.camera.up = self.camera_up
+        self.render.mark_dirty('camera', self.flush_camera)
+
+    def flush_camera(self):
+        with metrics.phase('render'):
+            self.scene.camera.pos = self.camera_pos
+            self.scene.camera.axis = self.camera_target - self.camera_pos
+            self.scene.camera.up = self.camera_up
+
+    def check_game_end(self):
+        with metrics.phase('check_test'):
+            side = self.board.side_to_move
+            if self.is_in_check(side):
+                log.info("%s is in check", TURN_NAMES[side].capitalize())
+            if metrics.enabled:
+                metrics.count('termination')
+            ended = self.board.termination()
+            if ended is None:
+                return
+            self.stop_pondering()
+            reason = ended[0]
+            if reason == 'checkmate':
+                log.info("Checkmate! %s loses", TURN_NAMES[side].capitalize())
+                self.display_winner(TURN_NAMES[side ^ 1])
+            else:
+                self.display_draw(reason)
+
+    def is_engine_turn(self):
+        return self.players[self.board.side_to_move] is not None
+
+    def play_engine_move(self):
+        if self.game_over or not self.is_engine_turn():
+            return
+        with metrics.phase('engine'):
+            move = self.players[self.board.side_to_move].choose_move(self.board)
+        if move:
+            self.move_piece(square_xy(move_start(move)), square_xy(move_end(move)), move_promotion(move) or QUEEN)
+            self.check_game_end()
+            self.start_pondering()
+
+    def pondering_players(self):
+        if self.players == (None, None):
+            return []
+        from chess_ponder import PonderingEngine
+        return [player for player in self.players if isinstance(player, PonderingEngine)]
+
+    def start_pondering(self):
+        player = self.players[self.board.side_to_move ^ 1]
+        if not self.game_over and not self.is_engine_turn() and player in self.pondering_players():
+            player.ponder(self.board)
+
+    def stop_pondering(self):
+        for player in self.pondering_players():
+            player.stop()
 
     def handle_mouse_click(self, evt):
-        if self.menu_open or self.game_over:
+        if self.menu_open or self.game_over or self.is_engine_turn():
             return
+        if metrics.enabled:
+            metrics.count('mouse_click')
         pos = evt.pos
         x = int(pos.x + self.board_size / 2)
         y = int(pos.y + self.board_size / 2)
-        print(f"Clicked position: {x}, {y}")
+        if metrics.debug:
+            log.debug("Clicked position: %d, %d", x, y)
 
         if 0 <= x < self.board_size and 0 <= y < self.board_size:
             if self.selected_piece:
-                if (x, y) != self.selected_piece_pos and ((x, y) not in self.pieces or self.pieces[(x, y)].color != self.selected_piece.color):
-                    print(f"Attempting to move piece from {self.selected_piece_pos} to {(x, y)}")
-                    if self.is_valid_move(self.selected_piece_pos, (x, y)):
-                        print(f"Valid move for piece from {self.selected_piece_pos} to {(x, y)}")
+                if (x, y) != self.selected_piece_pos and not self.board.occupancy[self.board.side_to_move] & (1 << square(x, y)):
+                    if metrics.debug:
+                        log.debug("Attempting to move piece from %s to %s", self.selected_piece_pos, (x, y))
+                    with metrics.phase('validation'):
+                        legal = self.is_legal_move(self.selected_piece_pos, (x, y))
+                    if legal:
                         self.move_piece(self.selected_piece_pos, (x, y))
-                        if self.is_in_check(self.current_turn):
-                            print(f"{self.current_turn.capitalize()} is in check!")
-                            if self.is_checkmate(self.current_turn):
-                                print(f"Checkmate! {self.current_turn.capitalize()} loses!")
-                                self.display_winner('black' if self.current_turn == 'white' else 'white')
-                        self.current_turn = 'black' if self.current_turn == 'white' else 'white'
-                    else:
-                        print(f"Invalid move for piece from {self.selected_piece_pos} to {(x, y)}")
-                else:
-                    print(f"Cannot move to the same position or invalid destination {(x, y)}")
-                self.selected_piece = None
-                self.selected_piece_pos = None
-                if self.highlight_ring:
-                    self.highlight_ring.visible = False
-                    self.highlight_ring = None
-                for tile in self.highlight_tiles:
-                    tile.visible = False
-                self.highlight_tiles = []
+                        self.check_game_end()
+                    elif metrics.debug:
+                        log.debug("Invalid move for piece from %s to %s", self.selected_piece_pos, (x, y))
+                elif metrics.debug:
+                    log.debug("Cannot move to the same position or invalid destination %s", (x, y))
+                self.clear_selection()
             else:
-                if (x, y) in self.pieces and (
-                    (self.pieces[(x, y)].color == color.white and self.current_turn == 'white') or
-                    (self.pieces[(x, y)].color == color.black and self.current_turn == 'black')
-                ):
-                    self.selected_piece = self.pieces[(x, y)]
-                    self.selected_piece_pos = (x, y)
-                    print(f"Selected piece at: {self.selected_piece_pos}")
-                    if self.highlight_ring:
-                        self.highlight_ring.visible = False
-                    self.highlight_ring = ring(pos=self.pieces[(x, y)].graphics[0].pos, axis=vector(0, 0, 1), radius=0.5, thickness=0.1, color=color.yellow)
-                    self.highlight_tiles = self.highlight_moves(self.selected_piece_pos)
+                code = self.board.piece_at(square(x, y))
+                if code and piece_color(code) == self.board.side_to_move:
+                    with metrics.phase('selection'):
+                        self.selected_piece = self.pieces[(x, y)]
+                        self.selected_piece_pos = (x, y)
+                        if metrics.debug:
+                            log.debug("Selected piece at: %s", self.selected_piece_pos)
+                        self.highlight_tiles = self.highlight_moves(self.selected_piece_pos)
+                        self.render.mark_dirty('selection', self.flush_selection)
+
+    def clear_selection(self):
+        self.selected_piece = None
+        self.selected_piece_pos = None
+        self.highlight_tiles = []
+        self.render.mark_dirty('selection', self.flush_selection)
 
     def highlight_moves(self, pos):
-        moves = []
-        piece = self.pieces[pos]
-
-        if isinstance(piece, Rook):
-            moves.extend(self.highlight_straight_line_moves(pos, (1, 0)))  
-            moves.extend(self.highlight_straight_line_moves(pos, (-1, 0)))  
-            moves.extend(self.highlight_straight_line_moves(pos, (0, 1)))  
-            moves.extend(self.highlight_straight_line_moves(pos, (0, -1)))  
-        elif isinstance(piece, Knight):
-            knight_moves = [(2, 1), (2, -1), (-2, 1), (-2, -1),
-                            (1, 2), (1, -2), (-1, 2), (-1, -2)]
-            for move in knight_moves:
-                x, y = pos[0] + move[0], pos[1] + move[1]
-                if 0 <= x < self.board_size and 0 <= y < self.board_size:
-                    if self.is_valid_move(pos, (x, y)):
-                        tile = box(pos=vector(x - self.board_size / 2 + 0.5, y - self.board_size / 2 + 0.5, 0.05),
-                                   size=vector(self.tile_size, self.tile_size, 0.1), color=color.blue, opacity=0.5)
-                        moves.append(tile)
-        else:
-            for x in range(self.board_size):
-                for y in range(self.board_size):
-                    if self.is_valid_move(pos, (x, y)):
-                        tile = box(pos=vector(x - self.board_size / 2 + 0.5, y - self.board_size / 2 + 0.5, 0.05),
-                                size=vector(self.tile_size, self.tile_size, 0.1), color=color.blue, opacity=0.5)
-                        moves.append(tile)
-        return moves
-
-    def highlight_straight_line_moves(self, start, direction):
-        moves = []
-        x, y = start
-        dx, dy = direction
-        x += dx
-        y += dy
-        while 0 <= x < self.board_size and 0 <= y < self.board_size:
-            if (x, y) in self.pieces:
-                if self.pieces[(x, y)].color != self.pieces[start].color:
-                    tile = box(pos=vector(x - self.board_size / 2 + 0.5, y - self.board_size / 2 + 0.5, 0.05),
-                            size=vector(self.tile_size, self.tile_size, 0.1), color=color.blue, opacity=0.5)
-                    moves.append(tile)
-                break
-            tile = box(pos=vector(x - self.board_size / 2 + 0.5, y - self.board_size / 2 + 0.5, 0.05),
-                    size=vector(self.tile_size, self.tile_size, 0.1), color=color.blue, opacity=0.5)
-            moves.append(tile)
-            x += dx
-            y += dy
-        return moves
-
-    def move_piece(self, start, end):
-        print(f"Moving piece from {start} to {end}")
-        if end in self.pieces:
-            if isinstance(self.pieces[end], King):
-                self.display_winner('white' if self.pieces[end].color == color.black else 'black')
-                return
-            for part in self.pieces[end].graphics:
-                part.visible = False
-            del self.pieces[end]
-
-        piece = self.pieces.pop(start)
-        for part in piece.graphics:
-            part.pos = vector(end[0] - self.board_size / 2 + 0.5, end[1] - self.board_size / 2 + 0.5, part.pos.z)
-        self.pieces[end] = piece
-        self.move_history.append((start, end))
-        print(f"Moved piece from {start} to {end}")
+        if metrics.enabled:
+            metrics.count('legal_moves_from')
+        return [self.highlight_pool[move_end(move)] for move in self.board.legal_moves_from(square(*pos))]
+
+    def flush_selection(self):
+        with metrics.phase('render'):
+            wanted = set(self.highlight_tiles)
+            for tile in self.shown_tiles - wanted:
+                tile.visible = False
+            for tile in wanted - self.shown_tiles:
+                tile.visible = True
+            self.shown_tiles = wanted
+            if self.selected_piece:
+                ring_pos = self.square_center(self.selected_piece_pos, self.selected_piece.graphics[0].pos.z)
+                if self.highlight_ring.pos != ring_pos:
+                    self.highlight_ring.pos = ring_pos
+                if not self.highlight_ring.visible:
+                    self.highlight_ring.visible = True
+            elif self.highlight_ring.visible:
+                self.highlight_ring.visible = False
+
+    def move_piece(self, start, end, promotion=QUEEN):
+        if metrics.enabled:
+            metrics.count('move_piece')
+        log.info("Moving piece from %s to %s", start, end)
+        start_sq, end_sq = square(*start), square(*end)
+        if piece_kind(self.board.piece_at(start_sq)) != PAWN or not PROMOTION_RANKS >> end_sq & 1:
+            promotion = 0
+        self.board.history.clear_redo()
+        self.apply_move(encode_move(start_sq, end_sq, promotion))
+
+    def is_special_move(self, move):
+        start, end = move_start(move), move_end(move)
+        kind = piece_kind(self.board.piece_at(start))
+        return (move_promotion(move) != 0 or (kind == KING and abs(end - start) == 2)
+                or (kind == PAWN and end == self.board.ep_square))
+
+    def apply_move(self, move):
+        start, end = square_xy(move_start(move)), square_xy(move_end(move))
+        special = self.is_special_move(move)
+        captured_piece = self.pieces.pop(end, None)
+        if captured_piece:
+            self.hide_piece(captured_piece)
+        self.captured_pieces.append(captured_piece)
+        self.board.make_move(move)
+        self.place_piece(self.pieces.pop(start), end)
+        if special:
+            self.sync_pieces()
+
+    def sync_pieces(self):
+        for pos, piece in list(self.pieces.items()):
+            if piece.code != self.board.piece_at(square(*pos)):
+                self.park_piece(self.pieces.pop(pos))
+        for sq in iter_bits(self.board.occupied):
+            if square_xy(sq) not in self.pieces:
+                self.add_piece_graphics(square_xy(sq))
+
+    def place_piece(self, piece, pos):
+        self.pieces[pos] = piece
+        self.dirty_pieces[piece] = pos
+        self.render.mark_dirty('pieces', self.flush_pieces)
+
+    def hide_piece(self, piece):
+        self.dirty_pieces[piece] = None
+        self.render.mark_dirty('pieces', self.flush_pieces)
+
+    def flush_pieces(self):
+        dirty, self.dirty_pieces = self.dirty_pieces, {}
+        with metrics.phase('render'):
+            for piece, pos in dirty.items():
+                if pos is not None:
+                    piece.move_to(self.square_center(pos, piece.position.z))
+                piece.set_visible(pos is not None)
 
     def is_valid_move(self, start, end):
-        print(f"Validating move from {start} to {end}")
+        if metrics.enabled:
+            metrics.count('is_valid_move')
+        if metrics.debug:
+            log.debug("Validating move from %s to %s", start, end)
         if start == end:
-            print("Start and end positions are the same")
             return False
 
         if end[0] < 0 or end[0] >= self.board_size or end[1] < 0 or end[1] >= self.board_size:
-            print("End position is out of board bounds")
+            if metrics.debug:
+                log.debug("End position %s is out of board bounds", end)
             return False
 
-        piece = self.pieces[start]
-
-        if isinstance(piece, Pawn):
-            direction = 1 if piece.color == color.white else -1
-            start_row = 1 if piece.color == color.white else 6
-            dx = end[0] - start[0]
-            dy = end[1] - start[1]
-            if dx == 0:
-                if dy == direction and end not in self.pieces:
-                    return True
-                if dy == 2 * direction and start[1] == start_row and end not in self.pieces and (start[0], start[1] + direction) not in self.pieces:
-                    return True
-            elif abs(dx) == 1 and dy == direction and end in self.pieces and self.pieces[end].color != piece.color:
-                return True
-        elif isinstance(piece, Rook):
-            dx = end[0] - start[0]
-            dy = end[1] - start[1]
-            if dx == 0 or dy == 0:
-                return self.is_clear_path_rook(start, end)
-        elif isinstance(piece, Bishop):
-            dx = end[0] - start[0]
-            dy = end[1] - start[1]
-            if abs(dx) == abs(dy):
-                return self.is_clear_path_bishop(start, end)
-        elif isinstance(piece, Queen):
-            dx = end[0] - start[0]
-            dy = end[1] - start[1]
-            if dx == 0 or dy == 0:
-                return self.is_clear_path_rook(start, end)
-            if abs(dx) == abs(dy):
-                return self.is_clear_path_bishop(start, end)
-        elif isinstance(piece, King):
-            dx = end[0] - start[0]
-            dy = end[1] - start[1]
-            if abs(dx) <= 1 and abs(dy) <= 1:
-                return True
-        elif isinstance(piece, Knight):
-            return piece.is_valid_move(start, end, self.pieces)
-
-        return False
+        return self.board.is_valid_move(square(*start), square(*end))
 
-    def is_clear_path_rook(self, start, end):
-        dx = end[0] - start[0]
-        dy = end[1] - start[1]
+    def is_legal_move(self, start, end):
+        if not self.is_valid_move(start, end):
+            return False
+        if metrics.enabled:
+            metrics.count('is_legal')
+        return self.board.is_legal(encode_move(square(*start), square(*end)))
 
-        if dx != 0 and dy != 0:
-            print("Rook move is not in a straight line")
+    def is_clear_path_rook(self, start, end):
+        if start[0] != end[0] and start[1] != end[1]:
             return False
-        
-        step_x = int(dx / abs(dx)) if dx != 0 else 0
-        step_y = int(dy / abs(dy)) if dy != 0 else 0
-        x, y = start[0] + step_x, start[1] + step_y
-        
-        while (x, y) != end:
-            if (x, y) in self.pieces:
-                print(f"Rook move blocked by piece at {(x, y)}")
-                return False
-            x += step_x
-            y += step_y
-
-        return True
+        return self.board.is_clear_path(square(*start), square(*end))
 
     def is_clear_path_bishop(self, start, end):
-        dx = 1 if start[0] < end[0] else -1
-        dy = 1 if start[1] < end[1] else -1
-        x, y = start[0] + dx, start[1] + dy
-        while (x, y) != end:
-            if (x, y) in self.pieces:
-                return False
-            x += dx
-            y += dy
-        return True
+        return self.board.is_clear_path(square(*start), square(*end))
 
     def is_in_check(self, color):
-        king_pos = None
-        for pos, piece in self.pieces.items():
-            if isinstance(piece, King) and piece.color == color:
-                king_pos = pos
-                break
-        if king_pos is None:
-            return False
-
-        for pos, piece in self.pieces.items():
-            if piece.color != color:
-                if self.is_valid_move(pos, king_pos):
-                    return True
-        return False
+        if metrics.enabled:
+            metrics.count('is_in_check')
+        return self.board.is_in_check(color)
 
     def is_checkmate(self, color):
-        if not self.is_in_check(color):
-            return False
+        return self.board.is_checkmate(color)
 
-        for pos, piece in self.pieces.items():
-            if piece.color == color:
-                for x in range(self.board_size):
-                    for y in range(self.board_size):
-                        if self.is_valid_move(pos, (x, y)):
-                            original_pos = piece.position
-                            self.move_piece(pos, (x, y))
-                            if not self.is_in_check(color):
-                                self.move_piece((x, y), pos)
-                                return False
-                            self.move_piece((x, y), pos)
-                            piece.position = original_pos
-        return True
+    def is_stalemate(self, color):
+        return self.board.is_stalemate(color)
 
     def display_winner(self, winner_color):
         self.game_over = True
         msg = f"{winner_color.capitalize()} wins by checkmate!"
         self.message_text.text = msg
-        print(msg)
+        log.info(msg)
+
+    def display_draw(self, reason):
+        self.game_over = True
+        msg = f"Draw by {reason}!"
+        self.message_text.text = msg
+        log.info(msg)
 
     def handle_mouse_down(self, evt):
         self.dragging = True
@@ -420,41 +478,83 @@ class ChessGame:
             self.update_camera()
 
     def exit_game(self):
-        print("Exiting the game...")
+        log.info("Exiting the game...")
         self.close_game()
 
     def restart_game(self):
-        self.current_turn = 'white'
-        self.selected_piece = None
-        self.selected_piece_pos = None
-        if self.highlight_ring:
-            self.highlight_ring.visible = False
-            self.highlight_ring = None
-        for tile in self.highlight_tiles:
-            tile.visible = False
-        self.highlight_tiles = []
-        
+        self.load_fen(START_FEN)
+
+    def load_fen(self, fen):
+        self.stop_pondering()
+        self.board.set_fen(fen)
+        self.reset_view()
+
+    def reset_view(self):
+        self.clear_selection()
         for piece in self.pieces.values():
-            for part in piece.graphics:
-                part.visible = False
-        self.pieces = {}
-        
-        self.move_history = []
+            self.park_piece(piece)
+        for piece in self.captured_pieces:
+            if piece:
+                self.park_piece(piece)
+        self.captured_pieces = []
         self.draw_pieces()
         self.game_over = False
         self.message_text.text = ''
+        self.check_game_end()
+
+    def get_fen(self):
+        return self.board.fen()
+
+    def snapshot(self):
+        return self.board.snapshot()
+
+    def load_snapshot(self, data):
+        self.stop_pondering()
+        self.board.set_snapshot(data)
+        self.reset_view()
 
     def undo_last_move(self):
-        if len(self.move_history) > 0:
-            last_move = self.move_history.pop()
-            start_pos, end_pos = last_move
-            self.move_piece(end_pos, start_pos)
-            self.current_turn = 'black' if self.current_turn == 'white' else 'white'
+        if len(self.board.history) > 0:
+            self.stop_pondering()
+            self.clear_selection()
+            move = self.board.unmake_move()
+            self.board.history.push_redo(move)
+            end = square_xy(move_end(move))
+            self.place_piece(self.pieces.pop(end), square_xy(move_start(move)))
+            captured_piece = self.captured_pieces.pop()
+            if captured_piece:
+                self.place_piece(captured_piece, end)
+            if self.is_special_move(move):
+                self.sync_pieces()
+            self.game_over = False
+            self.message_text.text = ''
+
+    def redo_move(self):
+        move = self.board.history.pop_redo()
+        if move is not None:
+            self.stop_pondering()
+            self.clear_selection()
+            self.apply_move(move)
+            self.check_game_end()
+
+    def goto_ply(self, ply):
+        self.stop_pondering()
+        while len(self.board.history) > max(ply, 0):
+            self.undo_last_move()
+        self.clear_selection()
+        while len(self.board.history) < ply and self.board.history.can_redo():
+            self.apply_move(self.board.history.pop_redo())
+        self.check_game_end()
 
     def close_game(self):
+        self.closed = True
+        self.stop_pondering()
+        if metrics.enabled:
+            log.info("Session metrics: %s", metrics.snapshot())
         self.scene.delete()
         self.button_new_game.delete()
         self.undo_button.delete()
+        self.redo_button.delete()
         self.exit_button.delete()
 
     def show_instruction(self):
@@ -496,12 +596,47 @@ Chess Instructions:
    - Pawns can move forward two squares on their first move.
    - Pawns can capture en passant if an opponent's pawn moves two squares forward from its starting position and lands next to the capturing pawn.
    - Pawns can promote to any other piece (except a king) if they reach the opponent's back rank.
-6. The game ends when one player checkmates the other, or when a draw is declared due to stalemate, insufficient material, or other conditions.
+   - Pawns reaching the back rank in this game are promoted to a queen.
+6. The king can castle with an unmoved rook if the squares between them are empty and the king does not start, pass through or land on an attacked square.
+7. The game ends when one player checkmates the other, or in a draw by stalemate, insufficient material, the fifty-move rule (fifty moves by each side without a capture or pawn move) or threefold repetition.
 """
 
 if __name__ == "__main__":
-    game = ChessGame()
-    while True:
-        rate(30)
-        if game.game_over:
-            break
+    import argparse
+
+    parser = argparse.ArgumentParser(description='3D chess game.')
+    parser.add_argument('--engine', choices=('white', 'black'), help='let the computer play this side')
+    parser.add_argument('--think-time', type=float, default=1.0, help='engine time budget per move in seconds')
+    parser.add_argument('--fen', help='start from this position instead of the initial one')
+    parser.add_argument('--ponder', action='store_true', help='let the engine think during your turn')
+    parser.add_argument('--book', help='opening book for the engine, built with chess_book.py')
+    parser.add_argument('--endgame', help='endgame table for the engine, built with chess_book.py')
+    parser.add_argument('--renderer', choices=sorted(RENDERERS), default='vpython',
+                        help='scene backend; null and recording run without a display')
+    parser.add_argument('--log-level', help='log level for the chess logger, e.g. DEBUG or INFO')
+    parser.add_argument('--metrics', metavar='PATH', help='collect counters and phase timers, written to PATH on exit')
+    args = parser.parse_args()
+    if args.log_level or args.metrics:
+        metrics.configure(args.log_level, True if args.metrics else None, args.metrics)
+
+    engine = None
+    if args.engine:
+        from chess_engine import Engine
+
+        engine = Engine(time_limit=args.think_time, book=args.book, endgame=args.endgame)
+        if args.ponder:
+            from chess_ponder import PonderingEngine
+
+            engine = PonderingEngine(engine)
+    game = ChessGame(white_player=engine if args.engine == 'white' else None,
+                     black_player=engine if args.engine == 'black' else None,
+                     renderer=RENDERERS[args.renderer]())
+    if args.fen:
+        game.load_fen(args.fen)
+    while not game.closed:
+        if game.render.is_idle() and (game.game_over or not game.is_engine_turn()):
+            game.render.wait(0.25)
+            continue
+        game.renderer.rate(game.render.fps)
+        game.play_engine_move()
+        game.render.flush()
@@ -0,0 +1,48 @@
+import importlib.util
+import random
+import unittest
+
+from chess_board import BLACK, WHITE, Board, iter_bits
+from chess_engine import evaluate
+
+
+def random_fens(count, seed=5):
+    rng = random.Random(seed)
+    board = Board()
+    fens = []
+    while len(fens) < count:
+        board.setup_initial()
+        for _ in range(rng.randrange(1, 120)):
+            moves = board.legal_moves()
+            if not moves:
+                break
+            board.make_move(rng.choice(moves))
+            fields = board.fen().split()
+            fields[2:4] = ['-', '-']
+            fens.append(' '.join(fields))
+    return fens[:count]
+
+
+@unittest.skipUnless(importlib.util.find_spec('numpy'), 'numpy is not installed')
+class BatchParityTest(unittest.TestCase):
+    def test_matches_board_and_engine(self):
+        from chess_batch import analyse_batch, pack_fens
+
+        fens = random_fens(300)
+        bitboards, side = pack_fens(fens)
+        analysis = analyse_batch(bitboards, side)
+        board = Board()
+        for i, fen in enumerate(fens):
+            board.set_fen(fen)
+            attacked = [0, 0]
+            for color in (WHITE, BLACK):
+                for sq in iter_bits(board.occupancy[color]):
+                    attacked[color] |= board.attacks_from(sq)
+            self.assertEqual(int(analysis['score'][i]), evaluate(board), fen)
+            self.assertEqual(int(analysis['moves'][i]), len(board.generate_moves()), fen)
+            self.assertEqual([int(count) for count in analysis['attacked'][i]],
+                             [bin(attacks).count('1') for attacks in attacked], fen)
+
+
+if __name__ == '__main__':
+    unittest.main()
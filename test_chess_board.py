@@ -0,0 +1,166 @@
+import unittest
+
+from chess_bench import PERFT_POSITIONS, perft
+from chess_board import KNIGHT, QUEEN, START_FEN, Board, encode_move, parse_square
+from chess_notation import parse_uci
+from chess_pgn import PgnGame, validate_game
+
+
+def board_from_fen(fen):
+    board = Board()
+    board.set_fen(fen)
+    return board
+
+
+class EnPassantFenTest(unittest.TestCase):
+    def test_valid_square_is_kept(self):
+        board = board_from_fen('4k3/8/8/3Pp3/8/8/8/4K3 w - e6 0 1')
+        self.assertEqual(board.ep_square, parse_square('e6'))
+        self.assertIn(parse_square('d5') | (parse_square('e6') << 6), board.legal_moves())
+
+    def test_uncapturable_square_is_dropped(self):
+        board = board_from_fen('rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1')
+        self.assertIsNone(board.ep_square)
+
+    def test_rejects_impossible_squares(self):
+        for fen in ('4k3/8/8/3P4/8/8/8/4K3 w - e6 0 1',
+                    '4k3/8/8/8/4p3/3P4/8/4K3 w - e4 0 1',
+                    '4k3/4p3/8/3Pp3/8/8/8/4K3 w - e6 0 1',
+                    '4k3/8/4n3/3Pp3/8/8/8/4K3 w - e6 0 1',
+                    '4k3/8/8/8/3pP3/8/8/4K3 w - e3 0 1'):
+            with self.assertRaises(ValueError, msg=fen):
+                board_from_fen(fen)
+
+
+class SnapshotTest(unittest.TestCase):
+    def test_round_trip(self):
+        board = board_from_fen('r3k2r/8/8/3Pp3/8/8/8/R3K2R w Kq e6 0 1')
+        restored = Board()
+        restored.set_snapshot(board.snapshot())
+        self.assertEqual(restored.fen(), board.fen())
+
+    def test_rejects_impossible_ep_file(self):
+        board = board_from_fen('4k3/8/8/3Pn3/8/8/8/4K3 w - - 0 1')
+        data = bytearray(board.snapshot())
+        for i in range(4):
+            if (5 >> i) & 1:
+                data[5 + i] |= 0x80
+        with self.assertRaises(ValueError):
+            board.set_snapshot(bytes(data))
+        self.assertNotIn(parse_square('d5') | (parse_square('e6') << 6), board.legal_moves())
+
+    def test_uncapturable_ep_file_is_dropped(self):
+        board = board_from_fen('rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1')
+        board.ep_square = parse_square('e3')
+        restored = Board()
+        restored.set_snapshot(board.snapshot())
+        self.assertIsNone(restored.ep_square)
+
+
+class PositionValidationTest(unittest.TestCase):
+    INVALID = ('8/8/8/8/8/8/8/8 w - - 0 1',
+               '4k3/8/8/8/8/8/8/8 w - - 0 1',
+               '4k3/8/8/8/8/8/8/3KK3 w - - 0 1',
+               '4k3/8/8/8/8/8/8/P3K3 w - - 0 1',
+               'p3k3/8/8/8/8/8/8/4K3 w - - 0 1',
+               '4k3/4R3/8/8/8/8/8/4K3 w - - 0 1')
+
+    def test_rejects_impossible_positions(self):
+        for fen in self.INVALID:
+            with self.assertRaises(ValueError, msg=fen):
+                board_from_fen(fen)
+
+    def test_failed_fen_keeps_position(self):
+        board = board_from_fen(START_FEN)
+        with self.assertRaises(ValueError):
+            board.set_fen(self.INVALID[0])
+        self.assertEqual(board.fen(), START_FEN)
+
+    def test_pgn_verdict(self):
+        game = PgnGame(0, {'FEN': self.INVALID[0], 'SetUp': '1'}, '*', 1)
+        self.assertFalse(validate_game(game).valid)
+
+
+class TerminationTest(unittest.TestCase):
+    def assertTermination(self, fen, expected):
+        self.assertEqual(board_from_fen(fen).termination(), expected, fen)
+
+    def test_checkmate(self):
+        self.assertTermination('rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 1 3', ('checkmate', '0-1'))
+        self.assertTermination('R5k1/5ppp/8/8/8/8/8/6K1 b - - 0 1', ('checkmate', '1-0'))
+
+    def test_stalemate(self):
+        self.assertTermination('7k/5Q2/6K1/8/8/8/8/8 b - - 0 1', ('stalemate', '1/2-1/2'))
+
+    def test_insufficient_material(self):
+        draw = ('insufficient material', '1/2-1/2')
+        self.assertTermination('4k3/8/8/8/8/8/8/4K3 w - - 0 1', draw)
+        self.assertTermination('4k3/8/8/8/8/8/8/2N1K3 w - - 0 1', draw)
+        self.assertTermination('4kb2/8/8/8/8/8/8/2B1K3 w - - 0 1', draw)
+        self.assertTermination('2b1k3/8/8/8/8/8/8/2B1K3 w - - 0 1', None)
+        self.assertTermination('4k3/8/8/8/8/8/8/1NN1K3 w - - 0 1', None)
+        self.assertTermination('4k3/8/8/8/8/8/4P3/4K3 w - - 0 1', None)
+
+    def test_fifty_move_rule(self):
+        self.assertTermination('7k/8/6K1/8/8/8/8/R7 w - - 99 80', None)
+        self.assertTermination('7k/8/6K1/8/8/8/8/R7 w - - 100 80', ('fifty-move rule', '1/2-1/2'))
+        board = board_from_fen('7k/8/6K1/8/8/8/8/R7 w - - 99 80')
+        board.make_move(parse_uci('a1a2'))
+        self.assertEqual(board.termination(), ('fifty-move rule', '1/2-1/2'))
+        board.unmake_move()
+        board.make_move(parse_uci('a1a8'))
+        self.assertEqual(board.halfmove_clock, 100)
+        self.assertEqual(board.termination(), ('checkmate', '1-0'))
+
+    def test_threefold_repetition(self):
+        board = board_from_fen(START_FEN)
+        for ply, uci in enumerate(['g1f3', 'g8f6', 'f3g1', 'f6g8'] * 2):
+            self.assertIsNone(board.termination(), ply)
+            board.make_move(parse_uci(uci))
+        self.assertEqual(board.termination(), ('threefold repetition', '1/2-1/2'))
+        board.unmake_move()
+        self.assertIsNone(board.termination())
+
+
+class MoveUndoTest(unittest.TestCase):
+    def assertRoundTrip(self, fen, uci, expected_fen):
+        board = board_from_fen(fen)
+        key = board.hash
+        board.make_move(parse_uci(uci))
+        self.assertEqual(board.fen(), expected_fen)
+        self.assertEqual(board.hash, board.compute_hash())
+        board.unmake_move()
+        self.assertEqual(board.fen(), fen)
+        self.assertEqual(board.hash, key)
+
+    def test_castling_rights(self):
+        fen = 'r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1'
+        self.assertRoundTrip(fen, 'h1h2', 'r3k2r/8/8/8/8/8/7R/R3K3 b Qkq - 1 1')
+        self.assertRoundTrip(fen, 'a1a8', 'R3k2r/8/8/8/8/8/8/4K2R b Kk - 0 1')
+        self.assertRoundTrip(fen, 'e1e2', 'r3k2r/8/8/8/8/8/4K3/R6R b kq - 1 1')
+        self.assertRoundTrip(fen, 'e1g1', 'r3k2r/8/8/8/8/8/8/R4RK1 b kq - 1 1')
+        self.assertRoundTrip(fen, 'e1c1', 'r3k2r/8/8/8/8/8/8/2KR3R b kq - 1 1')
+
+    def test_en_passant(self):
+        self.assertRoundTrip('4k3/8/8/3Pp3/8/8/8/4K3 w - e6 0 2', 'd5e6', '4k3/8/4P3/8/8/8/8/4K3 b - - 0 2')
+        self.assertRoundTrip('4k3/8/8/8/3pP3/8/8/4K3 b - e3 0 1', 'd4e3', '4k3/8/8/8/8/4p3/8/4K3 w - - 0 2')
+
+    def test_promotion(self):
+        fen = 'r3k3/1P6/8/8/8/8/8/4K3 w - - 0 1'
+        self.assertRoundTrip(fen, 'b7b8n', 'rN2k3/8/8/8/8/8/8/4K3 b - - 0 1')
+        self.assertRoundTrip(fen, 'b7a8q', 'Q3k3/8/8/8/8/8/8/4K3 b - - 0 1')
+        self.assertEqual(encode_move(parse_square('b7'), parse_square('a8'), QUEEN), parse_uci('b7a8q'))
+        self.assertEqual(encode_move(parse_square('b7'), parse_square('b8'), KNIGHT), parse_uci('b7b8n'))
+
+
+class PerftTest(unittest.TestCase):
+    def test_shallow_perft(self):
+        for name, fen, expected in PERFT_POSITIONS:
+            board = board_from_fen(fen)
+            for depth in (1, 2):
+                self.assertEqual(perft(board, depth), expected[depth - 1], f"{name} depth {depth}")
+            self.assertEqual(board.fen(), fen)
+
+
+if __name__ == '__main__':
+    unittest.main()
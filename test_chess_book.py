@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+
+from chess_board import Board
+from chess_book import (LOSS, TABLE_ENTRY, TABLE_HEADER, TABLE_MAGIC, TABLE_VERSION, WIN, EndgameTable, OpeningBook,
+                        book_entry_move, book_move, build_book, mirrored_key)
+from chess_notation import parse_san, parse_uci
+from chess_pgn import PgnGame
+
+MATE_IN_ONE = '7k/8/6K1/8/8/8/8/1Q6 w - - 0 1'
+MATED = '1Q5k/8/6K1/8/8/8/8/8 b - - 1 1'
+MIRRORED_MATE_IN_ONE = '1q6/8/8/8/8/6k1/8/7K b - - 0 1'
+
+
+def board_from_fen(fen):
+    board = Board()
+    board.set_fen(fen)
+    return board
+
+
+class BookMoveTest(unittest.TestCase):
+    def test_entry_round_trip(self):
+        for fen, uci, entry in (('r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1', 'e1g1', 'e1h1'),
+                                ('r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1', 'e1c1', 'e1a1'),
+                                ('r3k2r/8/8/8/8/8/8/R3K2R b KQkq - 0 1', 'e8g8', 'e8h8'),
+                                ('r3k2r/8/8/8/8/8/8/R3K2R b KQkq - 0 1', 'e8c8', 'e8a8'),
+                                ('4k3/1P6/8/8/8/8/8/4K3 w - - 0 1', 'b7b8n', 'b7b8n'),
+                                ('4k3/1P6/8/8/8/8/8/4K3 w - - 0 1', 'b7b8q', 'b7b8q'),
+                                ('4k3/8/8/8/8/8/4P3/4K3 w - - 0 1', 'e2e4', 'e2e4')):
+            board = board_from_fen(fen)
+            move = parse_uci(uci)
+            encoded = book_entry_move(move, board)
+            start, end = parse_uci(entry[:4]) & 63, parse_uci(entry[:4]) >> 6
+            self.assertEqual((encoded >> 6 & 63, encoded & 63), (start, end), uci)
+            self.assertEqual(encoded >> 12, 'nbrq'.find(entry[4:]) + 1 if entry[4:] else 0, uci)
+            self.assertEqual(book_move(encoded, board), move, uci)
+
+    def test_built_book_returns_castling_and_promotion(self):
+        games = [PgnGame(0, {'Result': '1-0'}, '1. e4 e5 2. Nf3 Nc6 3. Bc4 Bc5 4. O-O Nf6 1-0', 1),
+                 PgnGame(1, {'Result': '1-0', 'FEN': '4k3/1P6/8/8/8/8/8/4K3 w - - 0 1', 'SetUp': '1'},
+                         '1. b8=N+ 1-0', 2)]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'book.bin')
+            build_book(games, path)
+            with OpeningBook(path) as book:
+                board = Board()
+                board.setup_initial()
+                for san in ('e4', 'e5', 'Nf3', 'Nc6', 'Bc4', 'Bc5'):
+                    board.make_move(parse_san(board, san))
+                self.assertEqual(book.choose_move(board, best=True), parse_uci('e1g1'))
+                board = board_from_fen('4k3/1P6/8/8/8/8/8/4K3 w - - 0 1')
+                self.assertEqual(book.probe(board), [(parse_uci('b7b8n'), 2)])
+
+
+class EndgameTableTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'table.bin')
+        entries = sorted([(board_from_fen(MATE_IN_ONE).hash, 1 * 2 + 1), (board_from_fen(MATED).hash, 0)])
+        text = b'KQvK:0'
+        with open(self.path, 'wb') as f:
+            f.write(TABLE_HEADER.pack(TABLE_MAGIC, TABLE_VERSION, 0, len(entries), len(text)))
+            f.write(text)
+            for key, value in entries:
+                f.write(TABLE_ENTRY.pack(key, value))
+
+    def test_mirrored_key(self):
+        for fen, mirrored in ((MATE_IN_ONE, MIRRORED_MATE_IN_ONE),
+                              ('8/8/3k4/8/8/2K5/6R1/8 w - - 0 1', '8/6r1/2k5/8/8/3K4/8/8 b - - 0 1')):
+            self.assertEqual(mirrored_key(board_from_fen(mirrored)), board_from_fen(fen).hash)
+            self.assertEqual(mirrored_key(board_from_fen(fen)), board_from_fen(mirrored).hash)
+
+    def test_probe_mate_in_one(self):
+        with EndgameTable(self.path) as table:
+            self.assertEqual(table.max_pieces, 3)
+            self.assertEqual(table.probe(board_from_fen(MATE_IN_ONE)), (WIN, 1))
+            self.assertEqual(table.probe(board_from_fen(MIRRORED_MATE_IN_ONE)), (WIN, 1))
+            self.assertEqual(table.probe(board_from_fen(MATED)), (LOSS, 0))
+            self.assertIsNone(table.probe(board_from_fen('7k/8/6K1/8/8/8/8/2Q5 w - - 0 1')))
+            self.assertIsNone(table.probe(board_from_fen('7k/8/6K1/8/8/8/8/R7 w - - 0 1')))
+
+
+if __name__ == '__main__':
+    unittest.main()
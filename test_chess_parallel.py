@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+
+from chess_board import Board, parse_square
+from chess_book import build_book
+from chess_engine import MATE_SCORE
+from chess_parallel import ParallelEngine, best_at_common_depth
+from chess_pgn import PgnGame
+
+
+def worker(iterations, nodes=100):
+    move, score = iterations[-1] if iterations else (1, 0)
+    return move, score, len(iterations), nodes, [move], iterations
+
+
+class CommonDepthTest(unittest.TestCase):
+    def test_compares_at_shallowest_completed_depth(self):
+        shallow = worker([(10, 30), (10, 20), (10, 25)])
+        deep = worker([(20, 10), (20, 60), (21, 15), (21, 5), (22, 90)])
+        self.assertEqual(best_at_common_depth([shallow, deep]), (10, 25, 3, [10]))
+
+    def test_uses_earlier_iteration_move(self):
+        shallow = worker([(10, 0), (10, -5)])
+        deep = worker([(20, 10), (21, 40), (22, -50)])
+        self.assertEqual(best_at_common_depth([shallow, deep]), (21, 40, 2, [21]))
+
+    def test_mate_counts_at_any_depth(self):
+        mate = worker([(10, 0), (11, MATE_SCORE - 3)])
+        deep = worker([(20, 10), (20, 20), (20, 30), (20, 40)])
+        self.assertEqual(best_at_common_depth([mate, deep]), (11, MATE_SCORE - 3, 2, [11]))
+
+    def test_ignores_workers_without_iterations(self):
+        idle = worker([])
+        done = worker([(20, -10)])
+        self.assertEqual(best_at_common_depth([idle, done])[0], 20)
+        self.assertEqual(best_at_common_depth([idle])[0], 1)
+
+
+class ParallelBookTest(unittest.TestCase):
+    def test_plays_book_move(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'book.bin')
+            build_book([PgnGame(0, {'Result': '1-0'}, '1. e4 e5 1-0', 1)], path)
+            board = Board()
+            board.setup_initial()
+            with ParallelEngine(workers=2, book=path) as engine:
+                result = engine.search(board)
+        self.assertEqual(result.move, parse_square('e2') | (parse_square('e4') << 6))
+        self.assertEqual(result.depth, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
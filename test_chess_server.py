@@ -0,0 +1,100 @@
+import random
+import unittest
+
+from chess_board import PROMOTION_KINDS, Board, iter_bits
+from chess_notation import move_to_san, move_to_uci
+from chess_server import ChessServer, is_legal_move
+
+
+class ServerProtocolTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ChessServer(workers=1)
+        self.game = self.server.handle({'cmd': 'new'})['game']
+
+    def tearDown(self):
+        self.server.close()
+
+    def command(self, cmd, **fields):
+        return self.server.handle(dict(fields, cmd=cmd, game=self.game))
+
+    def test_move_updates_state(self):
+        reply = self.command('move', move='e2e4')
+        self.assertEqual(reply['san'], 'e4')
+        self.assertEqual(reply['turn'], 'black')
+        self.assertEqual(reply['fen'], 'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1')
+
+    def test_rejects_move_of_side_not_to_move(self):
+        with self.assertRaises(ValueError):
+            self.command('move', move='e7e5')
+        self.assertEqual(self.command('state')['turn'], 'white')
+
+    def test_select_rejects_side_not_to_move(self):
+        with self.assertRaises(ValueError):
+            self.command('select', square='d7')
+        with self.assertRaises(ValueError):
+            self.command('select', square='d4')
+        self.assertEqual(self.command('select', square='g1')['targets'], ['f3', 'h3'])
+
+    def test_select_then_move(self):
+        self.command('select', square='d2')
+        reply = self.command('move', to='d4')
+        self.assertEqual(reply['san'], 'd4')
+        with self.assertRaises(ValueError):
+            self.command('move', to='d5')
+
+    def test_undo_redo(self):
+        self.command('move', move='g1f3')
+        self.assertEqual(self.command('undo')['ply'], 0)
+        self.assertEqual(self.command('redo')['ply'], 1)
+        with self.assertRaises(ValueError):
+            self.command('redo')
+
+    def test_promotion(self):
+        self.command('fen', fen='4k3/1P6/8/8/8/8/8/4K3 w - - 0 1')
+        self.assertEqual(self.command('move', move='b7b8n')['san'], 'b8=N')
+        self.command('undo')
+        with self.assertRaises(ValueError):
+            self.command('move', move='b7b8')
+        self.command('select', square='b7')
+        self.assertEqual(self.command('move', to='b8')['san'], 'b8=Q+')
+
+    def test_game_over(self):
+        self.command('fen', fen='7k/5Q2/6K1/8/8/8/8/8 b - - 0 1')
+        self.assertEqual(self.command('state')['status'], 'stalemate')
+        with self.assertRaises(ValueError):
+            self.command('move', move='h8g8')
+
+    def test_unknown_command_and_game(self):
+        with self.assertRaises(ValueError):
+            self.server.handle({'cmd': 'bogus'})
+        with self.assertRaises(ValueError):
+            self.server.handle({'cmd': 'state', 'game': 999})
+
+    def test_other_clients_cannot_use_game(self):
+        owner, other = set(), set()
+        game = self.server.handle({'cmd': 'new'}, owner)['game']
+        for cmd in ('state', 'select', 'move', 'undo', 'close'):
+            with self.assertRaises(ValueError, msg=cmd):
+                self.server.handle({'cmd': cmd, 'game': game, 'square': 'e2', 'move': 'e2e4'}, other)
+        self.assertEqual(self.server.handle({'cmd': 'move', 'game': game, 'move': 'e2e4'}, owner)['ply'], 1)
+
+    def test_move_check_matches_legal_moves(self):
+        rng = random.Random(3)
+        board = Board()
+        for _ in range(4):
+            board.setup_initial()
+            for _ in range(60):
+                legal = board.legal_moves()
+                if not legal:
+                    break
+                candidates = {start | (end << 6) | (kind << 12) for start in iter_bits(board.occupied)
+                              for end in range(64) for kind in (0,) + PROMOTION_KINDS}
+                self.assertEqual({move for move in candidates if is_legal_move(board, move)}, set(legal))
+                move = rng.choice(legal)
+                self.command('fen', fen=board.fen())
+                self.assertEqual(self.command('move', move=move_to_uci(move))['san'], move_to_san(board, move))
+                board.make_move(move)
+
+
+if __name__ == '__main__':
+    unittest.main()
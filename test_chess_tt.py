@@ -0,0 +1,49 @@
+import random
+import tracemalloc
+import unittest
+
+from chess_board import Board
+from chess_tt import MOVE_LIST_ENTRY_BYTES, TranspositionTable
+
+BUDGET = 256 * 1024
+
+
+class MemoryBudgetTest(unittest.TestCase):
+    def measure(self, fill, **options):
+        tracemalloc.start()
+        try:
+            table = TranspositionTable(BUDGET, **options)
+            fill(table)
+            return table, tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+
+    def test_search_entries_fit_budget(self):
+        rng = random.Random(1)
+
+        def fill(table):
+            for _ in range(table.size * 4):
+                table.store(rng.getrandbits(64), (rng.randrange(1, 8), rng.randrange(-3000, 3000), rng.randrange(3),
+                                                  rng.getrandbits(15)), rng.randrange(8))
+        table, used = self.measure(fill)
+        self.assertGreater(table.usage(), 0.9)
+        self.assertLessEqual(used, BUDGET)
+
+    def test_move_cache_fits_budget(self):
+        rng = random.Random(2)
+
+        def fill(table):
+            board = Board(table)
+            while table.usage() < 0.9:
+                board.setup_initial()
+                for _ in range(80):
+                    moves = board.legal_moves()
+                    if not moves:
+                        break
+                    board.make_move(rng.choice(moves))
+        _, used = self.measure(fill, entry_bytes=MOVE_LIST_ENTRY_BYTES)
+        self.assertLessEqual(used, BUDGET)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import logging
+import os
+import subprocess
+import sys
+import unittest
+
+HEAVY_MODULES = ('vpython', 'chess_engine', 'chess_book', 'chess_ponder', 'argparse', 'concurrent.futures', 'mmap')
+
+
+class HeadlessImportTest(unittest.TestCase):
+    def test_import_skips_engine_and_display(self):
+        code = ("import sys, chessgame_final; "
+                f"print(','.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))")
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+        self.assertEqual(output, '')
+
+    def test_headless_game_without_players(self):
+        from chess_render import RecordingRenderer
+        from chessgame_final import ChessGame
+
+        game = ChessGame(renderer=RecordingRenderer())
+        game.move_piece((4, 1), (4, 3))
+        game.undo_last_move()
+        self.assertEqual(game.pondering_players(), [])
+        self.assertEqual(len(game.board.history), 0)
+
+    def test_metrics_count_real_checks(self):
+        from chess_metrics import log, metrics
+        from chess_render import RecordingRenderer
+        from chessgame_final import ChessGame
+
+        game = ChessGame(renderer=RecordingRenderer())
+        enabled, level = metrics.enabled, log.level
+        metrics.enabled = True
+        metrics.reset()
+        try:
+            game.highlight_moves((6, 0))
+            self.assertTrue(game.is_legal_move((6, 0), (5, 2)))
+            game.check_game_end()
+            for name in ('legal_moves_from', 'is_legal', 'termination'):
+                self.assertEqual(metrics.counters.get(name), 1, name)
+            log.setLevel(logging.DEBUG)
+            self.assertTrue(metrics.debug)
+        finally:
+            metrics.enabled = enabled
+            log.setLevel(level)
+            metrics.reset()
+
+    def test_game_end_stops_pondering(self):
+        from chess_engine import Engine
+        from chess_ponder import PonderingEngine
+        from chess_render import RecordingRenderer
+        from chessgame_final import ChessGame
+
+        player = PonderingEngine(Engine(time_limit=30))
+        game = ChessGame(black_player=player, renderer=RecordingRenderer())
+        game.load_fen('6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1')
+        game.start_pondering()
+        self.assertTrue(player.is_pondering())
+        game.move_piece((0, 0), (0, 7))
+        game.check_game_end()
+        self.assertTrue(game.game_over)
+        self.assertFalse(player.is_pondering())
+
+
+class ViewReplayTest(unittest.TestCase):
+    FEN = 'r3k2r/1P6/8/8/3p4/8/4P3/R3K2R w KQkq - 0 1'
+    MOVES = (((4, 1), (4, 3)), ((3, 3), (4, 2)), ((4, 0), (6, 0)), ((4, 7), (6, 7)), ((1, 6), (0, 7)),
+             ((4, 2), (4, 1)), ((5, 0), (5, 7)))
+
+    def setUp(self):
+        from chess_render import RecordingRenderer
+        from chessgame_final import ChessGame
+
+        self.game = ChessGame(renderer=RecordingRenderer())
+        self.game.load_fen(self.FEN)
+
+    def assertViewMatchesBoard(self):
+        game, board = self.game, self.game.board
+        game.render.flush()
+        occupied = {(sq % 8, sq // 8): board.piece_at(sq) for sq in range(64) if board.piece_at(sq)}
+        self.assertEqual({pos: piece.code for pos, piece in game.pieces.items()}, occupied, board.fen())
+        for pos, piece in game.pieces.items():
+            center = game.square_center(pos, piece.position.z)
+            self.assertTrue(piece.visible, pos)
+            self.assertEqual((piece.position.x, piece.position.y), (center.x, center.y), pos)
+        shown = set(map(id, game.pieces.values()))
+        for parked in game.piece_pool.values():
+            self.assertFalse(any(piece.visible for piece in parked if id(piece) not in shown))
+
+    def play(self):
+        from chess_board import KNIGHT
+
+        fens = [self.game.get_fen()]
+        for start, end in self.MOVES:
+            self.game.move_piece(start, end, KNIGHT)
+            self.assertViewMatchesBoard()
+            fens.append(self.game.get_fen())
+        return fens
+
+    def test_undo_and_redo(self):
+        fens = self.play()
+        self.assertTrue(fens[-2].startswith('N4rk1/'))
+        for fen in reversed(fens[:-1]):
+            self.game.undo_last_move()
+            self.assertViewMatchesBoard()
+            self.assertEqual(self.game.get_fen(), fen)
+        for fen in fens[1:]:
+            self.game.redo_move()
+            self.assertViewMatchesBoard()
+            self.assertEqual(self.game.get_fen(), fen)
+
+    def test_goto_ply(self):
+        fens = self.play()
+        for ply in (2, 5, 0, len(fens) - 1, 3, 1, 6):
+            self.game.goto_ply(ply)
+            self.assertViewMatchesBoard()
+            self.assertEqual(self.game.get_fen(), fens[ply])
+
+
+if __name__ == '__main__':
+    unittest.main()